@@ -0,0 +1,84 @@
+"""
+Measure the body work saved by parsing lazily.
+
+The old path parsed every POST body before routing; the new one skips it
+for 404s and rejected requests and parses JSON only when `inputs` is read.
+
+    python benchmarks/body_parsing.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from renus.core.request import Request
+
+
+def receiver(body: bytes, chunk: int = 65536):
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+
+    async def receive():
+        data = chunks.pop(0)
+        return {"type": "http.request", "body": data, "more_body": bool(chunks)}
+
+    return receive
+
+
+def scope(content_type: bytes):
+    return {"type": "http", "method": "POST", "path": "/", "query_string": b"",
+            "headers": [(b"content-type", content_type)]}
+
+
+def multipart_body(size: int):
+    boundary = b"renusbench"
+    body = (b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="title"\r\n\r\nhello\r\n'
+            b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="a.bin"\r\n'
+            b"Content-Type: application/octet-stream\r\n\r\n" + b"x" * size + b"\r\n"
+            b"--" + boundary + b"--\r\n")
+    return b"multipart/form-data; boundary=" + boundary, body
+
+
+async def measure(name, content_type, body, repeat=5):
+    async def old():
+        await Request(scope(content_type), receiver(body)).form()
+
+    async def not_found():
+        Request(scope(content_type), receiver(body))
+
+    async def unread():
+        await Request(scope(content_type), receiver(body)).load()
+
+    async def read():
+        request = Request(scope(content_type), receiver(body))
+        await request.load()
+        request.inputs
+
+    print(name)
+    for label, func in (("eager parse (old)", old), ("404 / rejected", not_found),
+                        ("handler ignores inputs", unread), ("handler reads inputs", read)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await func()
+        print(f"  {label:24} {(time.perf_counter() - start) / repeat * 1000:9.2f}ms")
+
+
+async def main():
+    items = [{"id": i, "name": f"item {i}", "tags": ["a", "b"], "note": "x" * 40} for i in range(20000)]
+    await measure("json 20k items", b"application/json", json.dumps(items).encode())
+    await measure("multipart 8MB file", *multipart_body(8 * 1024 * 1024))
+
+
+if __name__ == '__main__':
+    # requests read their body limits from config/app.json
+    with tempfile.TemporaryDirectory() as folder:
+        os.mkdir(os.path.join(folder, "config"))
+        with open(os.path.join(folder, "config", "app.json"), "w") as file:
+            json.dump({"env": "benchmark", "debug": False}, file)
+        os.chdir(folder)
+        asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Compare FileResponse throughput with the old fixed 4 KB aiofiles reads.
+
+The ASGI send is a no-op that only counts bytes, so the numbers measure
+the framework side of a download: reads, thread-pool hops and messages.
+
+    python benchmarks/file_response.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from renus.core.response import FileResponse
+
+SIZES = (256 * 1024, 8 * 1024 * 1024, 64 * 1024 * 1024)
+
+
+class OldFileResponse(FileResponse):
+    chunk_size = 4096
+
+
+class MappedFileResponse(FileResponse):
+    mmap_min_size = 1024 * 1024
+
+
+async def download(response_class, path: str, extensions=None):
+    sent = {"bytes": 0, "messages": 0}
+
+    async def send(message):
+        sent["messages"] += 1
+        sent["bytes"] += len(message.get("body", b"")) + message.get("count", 0)
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": extensions or {}}
+    await response_class(path, media_type="application/octet-stream")(scope, None, send)
+    return sent
+
+
+def run(response_class, path: str, size: int, extensions=None):
+    start = time.perf_counter()
+    sent = asyncio.run(download(response_class, path, extensions))
+    elapsed = time.perf_counter() - start
+    assert extensions or sent["bytes"] == size
+    return elapsed, sent["messages"]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        # responses read config/app.json from the application folder
+        os.mkdir(os.path.join(folder, "config"))
+        with open(os.path.join(folder, "config", "app.json"), "w") as file:
+            json.dump({"env": "benchmark", "debug": False}, file)
+        os.chdir(folder)
+        for size in SIZES:
+            path = os.path.join(folder, f"{size}.bin")
+            with open(path, "wb") as file:
+                file.write(os.urandom(size))
+            print(f"{size / 1024 / 1024:.2f}MB")
+            for name, response_class, extensions in (
+                ("4KB aiofiles (old)", OldFileResponse, None),
+                ("adaptive aiofiles", FileResponse, None),
+                ("adaptive mmap", MappedFileResponse, None),
+                ("zerocopysend", FileResponse, {"http.response.zerocopysend": {}}),
+            ):
+                elapsed = min(run(response_class, path, size, extensions)[0] for _ in range(3))
+                messages = run(response_class, path, size, extensions)[1]
+                print(f"  {name:<20} {size / elapsed / 1024 / 1024:9.1f} MB/s  {messages:>6} sends")
+
+
+if __name__ == '__main__':
+    main()
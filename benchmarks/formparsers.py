@@ -0,0 +1,76 @@
+"""
+Check that form parsing stays linear in the body size.
+
+The parsers used to re-join every accumulated chunk on each callback, which
+grows quadratically with large fields. Time per MB should stay roughly flat
+as the body grows; the script exits non-zero when it does not.
+
+    python benchmarks/formparsers.py
+"""
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+from renus.core.formparsers import FormParser, MultiPartParser
+
+CHUNK = 65536
+SIZES = (1, 4, 16)
+
+
+def stream(body: bytes):
+    async def gen():
+        for i in range(0, len(body), CHUNK):
+            yield body[i:i + CHUNK]
+        yield b""
+
+    return gen()
+
+
+def urlencoded_body(size: int) -> bytes:
+    return b"title=hello&big=" + b"a%2Bb" * (size // 5)
+
+
+def multipart_body(size: int):
+    boundary = b"renusbench"
+    body = (b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="note"\r\n\r\n' + b"n" * size + b"\r\n"
+            b"--" + boundary + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="a.bin"\r\n'
+            b"Content-Type: application/octet-stream\r\n\r\n" + b"x" * size + b"\r\n"
+            b"--" + boundary + b"--\r\n")
+    return body, b"multipart/form-data; boundary=" + boundary
+
+
+def run(parser_cls, headers, body) -> float:
+    start = time.perf_counter()
+    asyncio.run(parser_cls(headers, stream(body)).parse())
+    return time.perf_counter() - start
+
+
+def main():
+    ok = True
+    cases = (
+        ("urlencoded", FormParser,
+         lambda size: ({}, urlencoded_body(size))),
+        ("multipart", MultiPartParser,
+         lambda size: (lambda b, t: ({"content-type": t}, b))(*multipart_body(size))),
+    )
+    for name, parser_cls, make in cases:
+        print(name)
+        per_mb = []
+        for mb in SIZES:
+            headers, body = make(mb * 1024 * 1024)
+            elapsed = min(run(parser_cls, headers, body) for _ in range(3))
+            per_mb.append(elapsed / mb)
+            print(f"  {mb:>3}MB  {elapsed * 1000:9.2f}ms  {elapsed * 1000 / mb:7.2f}ms/MB")
+        ratio = per_mb[-1] / per_mb[0]
+        print(f"  growth {ratio:.2f}x per MB from {SIZES[0]}MB to {SIZES[-1]}MB")
+        if ratio > 1.75:
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
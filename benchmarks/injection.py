@@ -0,0 +1,47 @@
+"""
+Compare Injection.protect against the old one-parser-per-string path on
+typical API payloads.
+
+    python benchmarks/injection.py
+"""
+import json
+import sys
+import timeit
+from html import unescape
+
+sys.path.insert(0, '.')
+
+from renus.core.injection import Injection, Xss
+
+
+def old_escape(value: str):
+    parser = Xss()
+    parser.feed(unescape(value))
+    parser.close()
+    return parser.getEscaped().strip()
+
+
+def old_protect(value):
+    if value is None or type(value) in [bool, int, float]:
+        return value
+    if type(value) is dict:
+        return {old_escape(str(k)): old_protect(v) for k, v in value.items()}
+    if type(value) is list:
+        return [old_protect(v) for v in value]
+    return old_escape(str(value))
+
+
+payloads = {
+    'bulk records': [{'id': i, 'name': f'user {i}', 'email': f'user{i}@example.com', 'active': True,
+                      'tags': ['a', 'b', 'c'], 'city': 'Berlin', 'note': "it's ok"} for i in range(2000)],
+    'query string': {f'filter_{i}': f'value {i}' for i in range(40)},
+    'rich text': {'title': 'Hello', 'body': '<p>Some <b>bold</b> & <a href="x">link</a></p>' * 20},
+}
+
+for name, payload in payloads.items():
+    payload = json.loads(json.dumps(payload))
+    assert Injection().protect(payload) == old_protect(payload)
+    n = 5
+    old = timeit.timeit(lambda: old_protect(payload), number=n) / n
+    new = timeit.timeit(lambda: Injection().protect(payload), number=n) / n
+    print(f'{name:14} old {old * 1000:9.2f}ms  new {new * 1000:9.2f}ms  x{old / new:6.1f}')
@@ -0,0 +1,53 @@
+"""
+Time large list responses: the old cast pass + stdlib json against the
+codecs encoding ObjectId/datetime themselves.
+
+    python benchmarks/json_codec.py
+"""
+import datetime
+import json
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from bson import ObjectId
+
+from renus.core.codec import codecs
+
+
+def documents(count: int):
+    now = datetime.datetime(2024, 1, 1, 12, 30)
+    return [{'_id': ObjectId(), 'name': f'item {i}', 'price': i * 1.5, 'tags': ['a', 'b'],
+             'owner': {'_id': ObjectId(), 'name': 'owner'}, 'created_at': now, 'updated_at': now}
+            for i in range(count)]
+
+
+def cast(document: dict):
+    # what ModelBase.__cleaner does for each document when cast is on
+    for field in ('_id', 'created_at', 'updated_at', 'owner'):
+        if field in document:
+            value = document[field]
+            document[field] = cast(dict(value)) if type(value) is dict else str(value)
+    return document
+
+
+def old(docs):
+    return json.dumps([cast(dict(d)) for d in docs], ensure_ascii=False, allow_nan=True,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    for count in (1000, 20000):
+        docs = documents(count)
+        assert old(docs) == codecs['std'].dumps(docs)
+        n = max(1, 20000 // count)
+        base = timeit.timeit(lambda: old(docs), number=n) / n
+        print(f'{count} documents  cast + json.dumps {base * 1000:8.2f}ms')
+        for name, codec in codecs.items():
+            took = timeit.timeit(lambda: codec.dumps(docs), number=n) / n
+            print(f'{"":16}{name:17} {took * 1000:8.2f}ms  x{base / took:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
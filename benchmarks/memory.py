@@ -0,0 +1,143 @@
+"""
+Measure the memory held per request object with tracemalloc, against the
+representations used before `__slots__`.
+
+Each case keeps `COUNT` objects alive, the way long-polling requests
+waiting on an event would, and reports the traced bytes per object.
+
+    python benchmarks/memory.py
+"""
+import sys
+import tracemalloc
+
+sys.path.insert(0, '.')
+
+from renus.core.datastructures import FormData, Headers, QueryParams, Store, UploadFile
+from renus.core.request import Request, cookie_parser
+
+COUNT = 10000
+
+
+def scope(i: int):
+    return {"type": "http", "method": "GET", "path": f"/items/{i}",
+            "query_string": b"page=1&sort=name&filter=active",
+            "headers": [(b"host", b"example.com"), (b"user-agent", b"bench"),
+                        (b"cookie", b"session=abc; theme=dark"),
+                        (b"accept", b"application/json")]}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+class OldStore:
+    def __init__(self):
+        super().__setattr__("_store", {})
+
+    def __setattr__(self, key, value):
+        self._store[key] = value
+
+
+class OldHeaders(Headers):
+    pass  # no __slots__, so instances get a __dict__ again
+
+
+class OldUploadFile(UploadFile):
+    pass
+
+
+class OldFormData:
+    def __init__(self, items):
+        self._dict = {k: v for k, v in items}
+        self._list = list(items)
+
+
+class OldRequest:
+    """
+    Attributes in the instance dict, lazy ones added on first use.
+    """
+
+    def __init__(self, scope, receive):
+        self._scope = scope
+        self._receive = receive
+        self._headers = OldHeaders(scope["headers"])
+        self._stream_consumed = False
+        self.store = OldStore()
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def query_params(self):
+        if not hasattr(self, "_query_params"):
+            self._query_params = QueryParams(self._scope["query_string"])
+        return self._query_params
+
+    @property
+    def cookies(self):
+        if not hasattr(self, "_cookies"):
+            self._cookies = cookie_parser("; ".join(self.headers.getlist("cookie")))
+        return self._cookies
+
+
+def idle_request(i, cls=Request):
+    return cls(SCOPES[i], receive)
+
+
+def used_request(i, cls=Request):
+    request = cls(SCOPES[i], receive)
+    request.route = {"path": "/items/{id}", "args": {"id": str(i)}}
+    request.query_params.get("page")
+    request.headers.get("host")
+    request.cookies
+    request.store.user = i
+    return request
+
+
+def store(i):
+    return Store()
+
+
+def form(i):
+    return FormData([("title", "hello"), ("tag", "a"), ("tag", "b"), ("body", "text")])
+
+
+def upload(i):
+    return UploadFile("upload.txt")
+
+
+OLD = {
+    "request (idle)": lambda i: idle_request(i, OldRequest),
+    "request (used)": lambda i: used_request(i, OldRequest),
+    "store": lambda i: OldStore(),
+    "form data": lambda i: OldFormData([("title", "hello"), ("tag", "a"), ("tag", "b"), ("body", "text")]),
+    "upload file": lambda i: OldUploadFile("upload.txt"),
+}
+
+
+def measure(factory) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(COUNT)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del objects
+    return size / COUNT
+
+
+# scopes belong to the server, so they are built before measuring
+SCOPES = [scope(i) for i in range(COUNT)]
+
+
+def main():
+    for name, factory in (("request (idle)", idle_request), ("request (used)", used_request),
+                          ("store", store), ("form data", form), ("upload file", upload)):
+        old = measure(OLD[name])
+        new = measure(factory)
+        print(f"{name:<16} old {old:8.0f} bytes  new {new:8.0f} bytes  x{old / new:5.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare the compiled route table against the old per-request linear scan.
+
+    python benchmarks/routing.py [routes]
+"""
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from renus.core.routing import Router, build, build_path
+
+
+def linear_scan(routes, method, path):
+    for route in routes[method]:
+        regex, params = build_path(route['path'])
+        find = regex.search(path)
+        if find:
+            return build(route, {param: find.group(param) for param in params})
+    return False
+
+
+def main(count: int = 500):
+    routes = {}
+    router = Router(routes=routes)
+    for i in range(count):
+        router.crud(f'/api/v1/resource{i}', f'resource{i}')
+        router.get(f'/api/v1/resource{i}/{{id}}/items/{{item}}', f'resource{i}@item')
+    table = Router(routes=routes).compile()
+
+    paths = [
+        ('GET', '/api/v1/resource0'),
+        ('GET', f'/api/v1/resource{count // 2}/42/items/7'),
+        ('PUT', f'/api/v1/resource{count - 1}/42'),
+        ('GET', '/api/v1/missing'),
+    ]
+    for method, path in paths:
+        assert table.match(method, path) == linear_scan(routes, method, path)
+        n = 200
+        old = timeit.timeit(lambda: linear_scan(routes, method, path), number=n) / n
+        new = timeit.timeit(lambda: table.match(method, path), number=n * 50) / (n * 50)
+        print(f'{method:6} {path:40} linear {old * 1e6:10.1f}us  tree {new * 1e6:8.2f}us  x{old / new:8.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
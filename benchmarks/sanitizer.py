@@ -0,0 +1,38 @@
+"""
+Differential check and timing of the compiled sanitizer against Xss.
+The corpus lives in tests/test_injection.py, which pytest runs.
+
+    python benchmarks/sanitizer.py
+"""
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from renus.core.injection import Injection
+from tests.test_injection import corpus, document
+
+def main():
+    parser = Injection()
+    compiled = Injection('compiled')
+
+    def outcome(injection, value):
+        try:
+            return injection.escape(value)
+        except Exception as exc:
+            return type(exc)
+
+    for value in corpus + [document(2000, seed) for seed in range(50)]:
+        assert outcome(parser, value) == outcome(compiled, value), value
+    print(f'{len(corpus) + 50} documents identical')
+
+    for size in (1000, 50000, 500000):
+        value = document(size)
+        n = max(1, 200000 // size)
+        old = timeit.timeit(lambda: parser.escape(value), number=n) / n
+        new = timeit.timeit(lambda: compiled.escape(value), number=n) / n
+        print(f'{size:7} chars  parser {old * 1000:9.2f}ms  compiled {new * 1000:8.2f}ms  x{old / new:5.1f}')
+
+
+if __name__ == '__main__':
+    main()
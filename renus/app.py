@@ -1,15 +1,14 @@
 import inspect
+import time
 import traceback
-from os import walk
-import json
 
 from renus.core.exception import debug_response
 from renus.core.websockets import WebSocket
-from renus.core.config import Config
-from renus.core.routing import Router
+from renus.core.config import Config, registry
+from renus.core.routing import Router, build
 from renus.core.request import Request
-from renus.core.response import Response, TextResponse, JsonResponse
-from renus.core.middleware import Middleware
+from renus.core.response import Response, TextResponse, JsonResponse, ResponseCache
+from renus.core.middleware import Pipeline
 
 
 class App:
@@ -17,7 +16,9 @@ class App:
                  on_startup=None,
                  on_shutdown=None) -> None:
         self.load_configs()
-        self.load_configs()
+        self.controllers = {}
+        self.pipelines = {}
+        self.response_cache = ResponseCache(Config('app').get('response_cache_size', 512))
         self.on_startup = [] if on_startup is None else list(on_startup)
         self.on_shutdown = [] if on_shutdown is None else list(on_shutdown)
 
@@ -31,10 +32,9 @@ class App:
     async def __call__(self, scope, receive, send) -> None:
         scope["app"] = self
         assert scope["type"] in ("http", "websocket", "lifespan")
-        self.scope = scope
 
         if scope["type"] == "http":
-            await self.http(send, receive)
+            await self.http(scope, receive, send)
 
         if scope["type"] == "lifespan":
             await self.lifespan(scope, receive, send)
@@ -43,40 +43,33 @@ class App:
             await self.websocket(scope, receive, send)
 
     async def websocket(self, scope, receive, send) -> None:
-        self.scope = scope
-        self.scope["method"] = 'WS'
-        self.send = send
-        self.receive = receive
-        self.ws = WebSocket(self.scope, self.receive, self.send)
+        scope["method"] = 'WS'
+        ws = WebSocket(scope, receive, send)
 
         try:
-            res = self.load_routes()
+            res = self.load_routes(scope)
 
-            setattr(self.ws, 'route', res)
+            setattr(ws, 'route', res)
             if not res:
-                await self.ws.close(1004)
+                await ws.close(1004)
             else:
-                middlewares = Config('app', self.ws).get('middlewares_ws', [])
-                middlewares = middlewares + res['middlewares']
-                passed = Middleware(self.ws, middlewares).next()
+                middlewares = Config('app', ws).get('middlewares_ws', [])
+                passed = await self.pipeline(middlewares + res['middlewares'])(ws)
 
                 if passed is not True:
-                    await self.ws.close(1003)
+                    await ws.close(1003)
                     return
 
-                if res["controller"] is not None:
-                    controller = import_by_string(res["controller"])
-                    method = getattr(controller, res['func'])
-                else:
-                    method = res['func']
+                handler = self.resolve(res)
+                method = handler['method'] if handler['class'] is None else getattr(handler['class'](), res['func'])
 
-                res['args']['ws'] = self.ws
+                res['args']['ws'] = ws
 
                 await method(**res['args'])
 
         except Exception as exc:
             debug_response(exc)
-            if Config('app',self.ws).get('env', 'local') == 'local':
+            if Config('app',ws).get('env', 'local') == 'local':
                 raise
 
     async def lifespan(self, scope, receive, send) -> None:
@@ -109,22 +102,17 @@ class App:
         else:
             await send({"type": "lifespan.shutdown.complete"})
 
-    async def http(self, send, receive):
-        self.scope["method"] = self.scope["method"].upper()
-        self.send = send
-        self.receive = receive
-        self.request = Request(self.scope, self.receive)
-
-        if self.scope["method"] in ['POST', 'PUT', 'DELETE']:
-            setattr(self.request, 'inputs', await Request(self.scope, self.receive).form())
+    async def http(self, scope, receive, send):
+        scope["method"] = scope["method"].upper()
+        request = Request(scope, receive)
 
         try:
-            await self.view()
+            await self.view(request, send)
         except Exception as exc:
             from renus.core.exception import debug_response
             debug = debug_response(exc)
-            await self.result(JsonResponse(*debug))
-            if Config('app',self.request).get('env', 'local') == 'local':
+            await self.result(JsonResponse(*debug), request, send)
+            if Config('app',request).get('env', 'local') == 'local':
                 raise
 
     async def startup(self) -> None:
@@ -132,6 +120,8 @@ class App:
         Run any `.on_startup` event handlers.
         """
         print('application startup')
+        if Config('app').get('warmup', True):
+            self.warmup()
         for handler in self.on_startup:
             if inspect.isasyncgenfunction(handler):
                 await handler()
@@ -149,59 +139,146 @@ class App:
             else:
                 handler()
 
-    async def view(self):
-        res = self.load_routes()
+    async def view(self, request, send):
+        res = self.load_routes(request.scope)
 
-        setattr(self.request, 'route', res)
+        setattr(request, 'route', res)
         if not res:
-            await self.result(TextResponse('not_found', 404))
+            await self.result(TextResponse('not_found', 404), request, send)
         else:
-            middlewares = Config('app', self.request).get('middlewares', [])
-            middlewares = middlewares + res['middlewares']
-            passed = Middleware(self.request, middlewares).next()
+            middlewares = Config('app', request).get('middlewares', [])
+            passed = await self.pipeline(middlewares + res['middlewares'])(request)
+
+            if passed is not True and request.method != 'OPTIONS':
+                await self.result(JsonResponse(passed, 403), request, send)
+                return
+
+            cache_key = None
+            if res['cache'] and request.method == 'GET':
+                cache_key = self.response_cache.key(request)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    await self.result(cached, request, send)
+                    return
 
-            if passed is not True and self.request.method != 'OPTIONS':
-                await self.result(JsonResponse(passed, 403))
-            else:
-                if res["controller"] is not None:
-                    controller = import_by_string(res["controller"])
-                    method = getattr(controller, res['func'])
-                else:
-                    method = res['func']
+            if request.method in ['POST', 'PUT', 'DELETE']:
+                request.check_content_length()
+                if not res['stream']:
+                    await request.load()
 
-                if 'request' in method.__code__.co_varnames:
-                    res['args']['request'] = self.request
+            handler = self.resolve(res)
+            method = handler['method'] if handler['class'] is None else getattr(handler['class'](), res['func'])
 
-                if inspect.iscoroutinefunction(method):
-                    await self.result(await method(**res['args']))
-                else:
-                    await self.result(method(**res['args']))
+            if handler['request']:
+                res['args']['request'] = request
 
-    async def result(self, response):
+            if handler['is_async']:
+                response = await method(**res['args'])
+            else:
+                response = method(**res['args'])
+
+            if cache_key is not None:
+                if not isinstance(response, Response):
+                    response = TextResponse(response)
+                response = self.response_cache.put(cache_key, response, res['cache'])
+            await self.result(response, request, send)
+
+    def pipeline(self, middlewares):
+        key = tuple(middlewares)
+        pipeline = self.pipelines.get(key)
+        if pipeline is None:
+            pipeline = self.pipelines[key] = Pipeline(middlewares)
+        return pipeline
+
+    def resolve(self, res):
+        key = (res['controller'], res['func'])
+        handler = self.controllers.get(key)
+        if handler is None:
+            handler = self.controllers[key] = resolve_controller(res['controller'], res['func'])
+        return handler
+
+    async def result(self, response, request, send):
         if not isinstance(response, Response):
             response = TextResponse(response)
-        await response(self.scope, self.receive, self.send)
+        await response(request.scope, request.receive, send)
 
-    def load_routes(self):
+    def load_routes(self, scope):
         if not hasattr(self, "routes"):
-            import routes.index
-            self.routes = Router().all()
+            self.build_routes()
 
-        return Router(self.scope, self.routes).response()
+        return self.route_table.response(scope)
 
-    def load_configs(self):
-        self.configs = {}
-        files = []
+    def build_routes(self):
+        import routes.index
+        self.routes = Router().all()
+        self.route_table = Router().compile(Config('app').get('route_cache_size', 1024))
+
+    def warmup(self):
+        """
+        Import and resolve everything the first requests would, so a broken
+        controller or middleware reference fails the startup instead.
+        """
+        timings = {}
+        start = time.perf_counter()
+        self.build_routes()
+        timings['routes'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for method, routes in self.routes.items():
+            for route in routes:
+                self.resolve(build(route, {}))
+        timings['controllers'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        config = Config('app')
+        for method, routes in self.routes.items():
+            key = 'middlewares_ws' if method == 'WS' else 'middlewares'
+            for route in routes:
+                self.pipeline(config.get(key, []) + route['middlewares'])
+        timings['middlewares'] = time.perf_counter() - start
+
+        for phase, seconds in timings.items():
+            print(f'warmup {phase}: {seconds * 1000:.1f}ms')
+        return timings
+
+    @property
+    def configs(self):
+        return registry.all()
 
-        for (dirpath, dirnames, filenames) in walk('config'):
-            files.extend(filenames)
-            break
-        for file in files:
-            with open(f'config/{file}') as json_file:
-                self.configs[file.replace('.json', '')] = json.load(json_file)
+    def load_configs(self):
+        return registry.load()
 
 
-def import_by_string(controller: str):
+def import_controller(controller: str):
     full_path = f'app.http.{controller}.controller'
     c = controller.split('.')
-    return getattr(__import__(full_path, fromlist=['']), c[-1].title().replace('_', '') + 'Controller')()
+    return getattr(__import__(full_path, fromlist=['']), c[-1].title().replace('_', '') + 'Controller')
+
+
+def import_by_string(controller: str):
+    return import_controller(controller)()
+
+
+def resolve_controller(controller, func):
+    """
+    Resolve a route handler once. Controllers are shared between requests
+    unless the class sets `per_request = True`, in which case a new instance
+    is created for every request.
+    """
+    cls = None
+    if controller is None:
+        method = func
+    else:
+        cls = import_controller(controller)
+        method = getattr(cls, func)
+        if not getattr(cls, 'per_request', False):
+            method = getattr(cls(), func)
+            cls = None
+
+    params = inspect.signature(method).parameters
+    return {
+        'class': cls,
+        'method': method,
+        'is_async': inspect.iscoroutinefunction(method),
+        'request': 'request' in params,
+    }
@@ -0,0 +1,81 @@
+import base64
+import datetime
+import json
+import typing
+
+from renus.core.config import registry
+
+try:
+    from bson import ObjectId
+except ImportError:  # pragma: no cover
+    ObjectId = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def default(obj):
+    """
+    Encode the values stored by `ModelBase`: `ObjectId` and dates the way
+    `str()` prints them and bytes as base64. Other mappings, such as the
+    `FormData` of a form request, are encoded as dicts.
+    """
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return str(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode("ascii")
+    if isinstance(obj, typing.Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+class JsonCodec:
+    name = "std"
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+    def dumps(self, content) -> bytes:
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=True,
+            indent=None,
+            separators=(",", ":"),
+            default=default,
+        ).encode("utf-8")
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+    options = 0 if orjson is None else orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def loads(self, data: bytes):
+        return orjson.loads(data)
+
+    def dumps(self, content) -> bytes:
+        try:
+            return orjson.dumps(content, default=default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits
+            return super().dumps(content)
+
+
+codecs = {"std": JsonCodec()}
+if orjson is not None:
+    codecs["orjson"] = OrjsonCodec()
+
+
+def codec() -> JsonCodec:
+    """
+    The codec selected by `json` in `config/app.json`: `std` (default),
+    `orjson` or `auto`, which use orjson when it is installed.
+    """
+    name = registry.all().get("app", {}).get("json", "std")
+    if name == "auto":
+        name = "orjson"
+    return codecs.get(name, codecs["std"])
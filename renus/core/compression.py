@@ -0,0 +1,352 @@
+import functools
+import glob
+import gzip
+import hashlib
+import os
+import threading
+import time
+import typing
+import uuid
+import zlib
+
+from renus.core.config import registry
+from renus.core.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+def _gzip(body: bytes, level: int) -> bytes:
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _deflate(body: bytes, level: int) -> bytes:
+    return zlib.compress(body, level)
+
+
+def _brotli(body: bytes, level: int) -> bytes:
+    return brotli.compress(body, quality=level)
+
+
+def _zstd(body: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+encoders = {"gzip": _gzip, "deflate": _deflate}
+if brotli is not None:
+    encoders["br"] = _brotli
+if zstandard is not None:
+    encoders["zstd"] = _zstd
+
+default_levels = {"gzip": 6, "deflate": 6, "br": 4, "zstd": 3}
+
+# precompressed files served next to the original, e.g. app.js.gz
+sidecars = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+
+default_types = [
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "+json",
+    "+xml",
+]
+
+
+@functools.lru_cache(maxsize=256)
+def parse_accept_encoding(header: str) -> typing.Dict[str, float]:
+    """
+    `gzip;q=0.8, br, *;q=0` as `{'gzip': 0.8, 'br': 1.0, '*': 0.0}`.
+    """
+    weights = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+class Compressor:
+    """
+    Response compression as configured by `compression` in `config/app.json`:
+
+        "compression": {
+            "codecs": ["br", "zstd", "gzip", "deflate"],
+            "level": {"gzip": 6, "br": 4},
+            "min_size": 500,
+            "types": ["text/", "application/json"],
+            "threadpool_size": 65536,
+            "file_cache": "storage/cache/compressed",
+            "file_cache_inline": 1048576,
+            "stream_flush_bytes": 0,
+            "stream_flush_interval": null
+        }
+
+    `codecs` is the server preference, used to break q-value ties; codecs
+    that are not installed are skipped. `level` is one int for every codec
+    or a per-codec dict. Bodies of `threadpool_size` bytes or more are
+    compressed off the event loop. Files are served from fresh sidecars or
+    compressed once per version into `file_cache` (null disables it). Files
+    over `file_cache_inline` bytes are compressed in the background and go
+    out uncompressed until their copy is ready. Streamed bodies are flushed as `StreamCompressor` describes.
+    """
+
+    def __init__(self, config: dict = None) -> None:
+        self.config = config
+        config = {} if config is None else config
+        self.preference = config.get("codecs", ["br", "zstd", "gzip", "deflate"])
+        self.codecs = [name for name in self.preference if name in encoders]
+        level = config.get("level", {})
+        if isinstance(level, int):
+            self.levels = {name: level for name in encoders}
+        else:
+            self.levels = {**default_levels, **level}
+        self.min_size = config.get("min_size", 500)
+        self.types = tuple(config.get("types", default_types))
+        self.threadpool_size = config.get("threadpool_size", 65536)
+        self.file_cache = config.get("file_cache", "storage/cache/compressed")
+        self.file_cache_inline = config.get("file_cache_inline", 1024 * 1024)
+        self.stream_flush_bytes = config.get("stream_flush_bytes", 0)
+        self.stream_flush_interval = config.get("stream_flush_interval", None)
+
+    def allowed(self, content_type: typing.Optional[str]) -> bool:
+        if not content_type:
+            return False
+        content_type = content_type.split(";", 1)[0].strip().lower()
+        return any(
+            content_type.endswith(item) if item.startswith("+") else content_type.startswith(item)
+            for item in self.types
+        )
+
+    def eligible(self, content_type: typing.Optional[str], size: int) -> bool:
+        return bool(self.codecs) and size >= self.min_size and self.allowed(content_type)
+
+    def ranked(self, header: str, codecs: typing.Iterable[str]) -> typing.List[str]:
+        """
+        `codecs` the client accepts, best q-value first, ties in `codecs` order.
+        """
+        if not header:
+            return []
+        weights = parse_accept_encoding(header)
+        fallback = weights.get("*", 0.0)
+        accepted = [(weights.get(name, fallback), i, name) for i, name in enumerate(codecs)]
+        return [name for q, i, name in sorted(accepted, key=lambda item: (-item[0], item[1])) if q > 0]
+
+    def negotiate(self, header: str, codecs: typing.Iterable[str] = None) -> typing.Optional[str]:
+        """
+        The best codec the client accepts, or None for identity.
+        """
+        if codecs is None:
+            codecs = self.codecs
+        ranked = self.ranked(header, [name for name in codecs if name in self.codecs])
+        return ranked[0] if ranked else None
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        return encoders[encoding](body, self.levels.get(encoding, default_levels[encoding]))
+
+    async def acompress(self, encoding: str, body: bytes) -> bytes:
+        if len(body) >= self.threadpool_size:
+            return await run_in_threadpool(self.compress, encoding, body)
+        return self.compress(encoding, body)
+
+    def stream(self, encoding: str) -> "StreamCompressor":
+        return StreamCompressor(encoding, self.levels.get(encoding, 6),
+                                self.stream_flush_bytes, self.stream_flush_interval)
+
+    def compress_file(self, encoding: str, source: str, target: str) -> None:
+        """
+        Compress `source` into `target`; the file appears complete or not at all.
+        """
+        temp = f"{target}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        level = self.levels.get(encoding, default_levels[encoding])
+        block_size = 1024 * 1024
+        try:
+            with open(source, "rb") as src, open(temp, "wb") as dst:
+                if encoding == "zstd":
+                    zstandard.ZstdCompressor(level=level).copy_stream(src, dst, read_size=block_size)
+                else:
+                    if encoding == "br":
+                        compressobj = brotli.Compressor(quality=level)
+                        compress, flush = compressobj.process, compressobj.finish
+                    else:
+                        wbits = 31 if encoding == "gzip" else 15
+                        compressobj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+                        compress, flush = compressobj.compress, compressobj.flush
+                    for block in iter(lambda: src.read(block_size), b""):
+                        dst.write(compress(block))
+                    dst.write(flush())
+            os.replace(temp, target)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def cached_file(self, encoding: str, path: str, stat_result: os.stat_result) -> typing.Optional[
+            typing.Tuple[str, os.stat_result]]:
+        """
+        The cached copy of `path`, made right away for a small file. None
+        while another request or a background thread is still making it.
+        """
+        key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        target = os.path.join(self.file_cache, f"{key}-{stat_result.st_mtime_ns}-{stat_result.st_size}.{encoding}")
+        try:
+            return target, os.stat(target)
+        except FileNotFoundError:
+            pass
+        with _filling_lock:
+            if target in _filling:
+                return None
+            _filling.add(target)
+        if os.path.exists(target):
+            # finished between the stat above and the lock
+            self.fill_done(target)
+            return target, os.stat(target)
+        if stat_result.st_size > self.file_cache_inline:
+            threading.Thread(target=self.fill_quietly, args=(encoding, path, key, target), daemon=True).start()
+            return None
+        self.fill(encoding, path, key, target)
+        return target, os.stat(target)
+
+    def fill(self, encoding: str, path: str, key: str, target: str) -> None:
+        try:
+            os.makedirs(self.file_cache, exist_ok=True)
+            for stale in glob.glob(os.path.join(self.file_cache, f"{key}-*.{encoding}")):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            self.compress_file(encoding, path, target)
+        finally:
+            self.fill_done(target)
+
+    def fill_done(self, target: str) -> None:
+        with _filling_lock:
+            _filling.discard(target)
+
+    def fill_quietly(self, encoding: str, path: str, key: str, target: str) -> None:
+        try:
+            self.fill(encoding, path, key, target)
+        except OSError:
+            pass  # the file keeps going out uncompressed
+
+    def file_variant(self, path: str, stat_result: os.stat_result, header: str) -> typing.Tuple[
+            typing.Optional[str], str, os.stat_result]:
+        """
+        `(encoding, path, stat)` of the best variant of `path` the client
+        accepts: a sidecar no older than the file, else the cached copy.
+        `(None, path, stat_result)` when the file goes out as is, also
+        while its cached copy is being made.
+        Blocking; meant for `run_in_threadpool`.
+        """
+        for name in self.ranked(header, self.preference):
+            suffix = sidecars.get(name)
+            if suffix is not None:
+                try:
+                    sidecar = os.stat(path + suffix)
+                except OSError:
+                    sidecar = None
+                if sidecar is not None and sidecar.st_mtime >= stat_result.st_mtime:
+                    return name, path + suffix, sidecar
+            if name in encoders and self.file_cache:
+                try:
+                    cached = self.cached_file(name, path, stat_result)
+                except OSError:
+                    continue
+                if cached is None:
+                    break
+                return (name,) + cached
+        return None, path, stat_result
+
+
+class StreamCompressor:
+    """
+    Incremental gzip/deflate for streamed bodies.
+
+    Output is flushed (Z_SYNC_FLUSH) so the client can decode it after every
+    chunk by default, or once `flush_bytes` input bytes are pending, or
+    `flush_interval` seconds after the last flush, whichever comes first.
+    `StreamingResponse` flushes on that timer even when no chunk arrives.
+    """
+
+    def __init__(self, encoding: str, level: int = 6, flush_bytes: int = 0,
+                 flush_interval: float = None) -> None:
+        wbits = 31 if encoding == "gzip" else 15
+        self._compressobj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._flushed = time.monotonic()
+
+    def should_flush(self) -> bool:
+        if not self.flush_bytes and self.flush_interval is None:
+            return True
+        if self.flush_bytes and self._pending >= self.flush_bytes:
+            return True
+        return self.flush_interval is not None and time.monotonic() - self._flushed >= self.flush_interval
+
+    def flush_timeout(self) -> typing.Optional[float]:
+        """
+        Seconds until the interval flush is due, None with nothing pending.
+        """
+        if self.flush_interval is None or not self._pending:
+            return None
+        return max(0.0, self.flush_interval - (time.monotonic() - self._flushed))
+
+    def flush(self) -> bytes:
+        self._pending = 0
+        self._flushed = time.monotonic()
+        return self._compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def compress(self, data: bytes) -> bytes:
+        compressed = self._compressobj.compress(data)
+        self._pending += len(data)
+        if self.should_flush():
+            compressed += self.flush()
+        return compressed
+
+    def finish(self) -> bytes:
+        return self._compressobj.flush()
+
+
+_compressor = Compressor()
+
+# cache targets being compressed, shared by every Compressor
+_filling = set()
+_filling_lock = threading.Lock()
+
+
+def compressor() -> Compressor:
+    """
+    The `Compressor` for the current `config/app.json`, rebuilt when the
+    config is reloaded.
+    """
+    global _compressor
+    config = registry.all().get("app", {}).get("compression")
+    if _compressor.config is not config:
+        _compressor = Compressor(config)
+    return _compressor
+
+
+def content_type(raw_headers: typing.List[typing.Tuple[bytes, bytes]]) -> typing.Optional[str]:
+    for key, value in raw_headers:
+        if key.lower() == b"content-type":
+            return value.decode("latin-1")
+    return None
@@ -8,7 +8,7 @@ T = typing.TypeVar("T")
 
 
 async def run_until_first_complete(*args: typing.Tuple[typing.Callable, dict]) -> None:
-    tasks = [handler(**kwargs) for handler, kwargs in args]
+    tasks = [asyncio.ensure_future(handler(**kwargs)) for handler, kwargs in args]
     (done, pending) = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
     [task.cancel() for task in pending]
     [task.result() for task in done]
@@ -1,15 +1,91 @@
 import json
+import os
+import time
 
-from renus.core.request import Request
+from renus.core.log import Log
+
+
+class ConfigRegistry:
+    """
+    Every `config/<name>.json` file parsed once and shared by the process.
+
+    Files are checked for changes at most every `config_reload_interval`
+    seconds (from `config/app.json`, default 2, 0 disables it). Only changed
+    files are parsed again and the new set is swapped in as a whole, so
+    readers never see a half-loaded config. A file that fails to parse keeps
+    its last good version and is tried again at the next check.
+    """
+
+    def __init__(self, path: str = 'config') -> None:
+        self.path = path
+        self._configs = None
+        self._mtimes = {}
+        self._checked = 0.0
+
+    def _scan(self):
+        mtimes = {}
+        try:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.json') and entry.is_file():
+                    mtimes[entry.name[:-5]] = entry.stat().st_mtime
+        except FileNotFoundError:
+            pass
+        return mtimes
+
+    def read(self, name: str):
+        with open(f'{self.path}/{name}.json') as json_file:
+            return json.load(json_file)
+
+    def load(self, changed_only: bool = False):
+        previous = self._configs or {}
+        mtimes = self._scan()
+        configs = {}
+        for name, mtime in mtimes.items():
+            if changed_only and name in previous and self._mtimes.get(name) == mtime:
+                configs[name] = previous[name]
+                continue
+            try:
+                configs[name] = self.read(name)
+            except (OSError, ValueError) as exc:
+                if name in previous:
+                    Log().warning(f'config {name}.json not reloaded: {exc}')
+                    configs[name] = previous[name]
+                mtimes[name] = self._mtimes.get(name)
+        self._configs, self._mtimes = configs, mtimes
+        self._checked = time.monotonic()
+        return configs
+
+    def reload_if_changed(self):
+        if self._configs is None:
+            return self.load()
+        interval = self._configs.get('app', {}).get('config_reload_interval', 2)
+        if not interval or time.monotonic() - self._checked < interval:
+            return self._configs
+        self._checked = time.monotonic()
+        if self._scan() != self._mtimes:
+            return self.load(changed_only=True)
+        return self._configs
+
+    def all(self):
+        return self.reload_if_changed()
+
+    def get(self, name: str):
+        configs = self.reload_if_changed()
+        if name not in configs:
+            # raises like a plain open() when the file is missing or broken
+            mtime = os.stat(f'{self.path}/{name}.json').st_mtime
+            config = self.read(name)
+            configs = self._configs = {**self._configs, name: config}
+            self._mtimes = {**self._mtimes, name: mtime}
+        return configs[name]
+
+
+registry = ConfigRegistry()
 
 
 class Config:
     def __init__(self, name: str, request=None) -> None:
-        if request is None or type(request) is not Request:
-            with open(f'config/{name}.json') as json_file:
-                self.config = json.load(json_file)
-        else:
-            self.config = request.app.configs[name]
+        self.config = registry.get(name)
 
     def get(self, name, default=None):
         if name in self.config:
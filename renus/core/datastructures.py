@@ -1,8 +1,13 @@
+import hashlib
+import html
 import tempfile
 import typing
 
+import aiofiles
 import asyncio
+from urllib.parse import parse_qsl
 from renus.core.concurrency import run_in_threadpool
+from renus.core.injection import injection
 
 class Background:
     def __init__(
@@ -20,6 +25,8 @@ class Background:
             await run_in_threadpool(self.func, *self.args, **self.kwargs)
 
 class MultiDict(typing.Mapping):
+    __slots__ = ("_list", "_index")
+
     def __init__(
         self,
         *args: typing.Union[
@@ -56,37 +63,29 @@ class MultiDict(typing.Mapping):
             )
             _items = list(value)
 
-        self._dict = {k: v for k, v in _items}
         self._list = _items
-
-    def keys(self) -> typing.KeysView:
-        return self._dict.keys()
-
-    def values(self) -> typing.ValuesView:
-        return self._dict.values()
-
-    def items(self) -> typing.ItemsView:
-        return self._dict.items()
+        # key -> position of its last value in `_list`
+        self._index = {k: i for i, (k, v) in enumerate(_items)}
 
     def multi_items(self) -> typing.List[typing.Tuple[str, str]]:
         return list(self._list)
 
     def get(self, key: typing.Any, default: typing.Any = None) -> typing.Any:
-        if key in self._dict:
-            return self._dict[key]
+        if key in self._index:
+            return self._list[self._index[key]][1]
         return default
 
     def __getitem__(self, key: typing.Any) -> str:
-        return self._dict[key]
+        return self._list[self._index[key]][1]
 
     def __contains__(self, key: typing.Any) -> bool:
-        return key in self._dict
+        return key in self._index
 
     def __iter__(self) -> typing.Iterator[typing.Any]:
-        return iter(self.keys())
+        return iter(self._index)
 
     def __len__(self) -> int:
-        return len(self._dict)
+        return len(self._index)
 
     def __eq__(self, other: typing.Any) -> bool:
         if not isinstance(other, self.__class__):
@@ -99,25 +98,172 @@ class MultiDict(typing.Mapping):
         return f"{class_name}({items!r})"
 
 
+class Headers(typing.Mapping):
+    """
+    A read-only, case-insensitive view over the raw ASGI header pairs.
+
+    Names and values are decoded and html-escaped only for the keys that are
+    read. `get` and `[]` return the last value of a repeated header, like the
+    old dict did, and `getlist` returns all of them.
+    """
+
+    __slots__ = ("raw", "_values")
+
+    def __init__(self, raw: typing.List[typing.Tuple[bytes, bytes]] = None) -> None:
+        self.raw = [] if raw is None else raw
+        self._values = {}
+
+    def getlist(self, key: str) -> typing.List[str]:
+        key = key.lower()
+        values = self._values.get(key)
+        if values is None:
+            name = key.encode("utf-8")
+            values = [html.escape(v.decode("utf-8")) for k, v in self.raw if k.lower() == name]
+            self._values[key] = values
+        return values
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        values = self.getlist(key)
+        return values[-1] if values else default
+
+    def __getitem__(self, key: str) -> str:
+        values = self.getlist(key)
+        if not values:
+            raise KeyError(key)
+        return values[-1]
+
+    def __contains__(self, key: typing.Any) -> bool:
+        name = key.lower().encode("utf-8")
+        return any(k.lower() == name for k, v in self.raw)
+
+    def _names(self) -> typing.List[str]:
+        return list(dict.fromkeys(html.escape(k.decode("utf-8").lower()) for k, v in self.raw))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.raw!r})"
+
+
+class QueryParams(typing.Mapping):
+    """
+    A read-only multidict over the raw query string.
+
+    The string is split on first access with the keys sanitized, and each
+    value is sanitized the first time it is read. `get` and `[]` return the
+    last value of a repeated key, like the old dict did, and `getlist`
+    returns all of them. Use `dict(params)` where a plain dict is needed;
+    `codec().dumps` encodes it as one.
+    """
+
+    __slots__ = ("raw", "_list", "_index", "_values", "_injection")
+
+    def __init__(self, query_string: bytes = b"") -> None:
+        self.raw = query_string
+        self._list = None
+        self._index = None
+        self._values = {}
+        self._injection = injection()
+
+    def _parse(self) -> typing.Dict[str, typing.List[int]]:
+        if self._index is None:
+            escape = self._injection.escape
+            keys = {}
+            self._list = []
+            self._index = {}
+            for key, value in parse_qsl(self.raw.decode("utf-8"), keep_blank_values=True):
+                escaped = keys.get(key)
+                if escaped is None:
+                    escaped = keys[key] = escape(key)
+                self._index.setdefault(escaped, []).append(len(self._list))
+                self._list.append((escaped, value))
+        return self._index
+
+    def _value(self, position: int) -> str:
+        value = self._values.get(position)
+        if value is None:
+            value = self._values[position] = self._injection.escape(self._list[position][1])
+        return value
+
+    def getlist(self, key: str) -> typing.List[str]:
+        return [self._value(i) for i in self._parse().get(key, ())]
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        positions = self._parse().get(key)
+        return self._value(positions[-1]) if positions else default
+
+    def __getitem__(self, key: str) -> str:
+        positions = self._parse().get(key)
+        if not positions:
+            raise KeyError(key)
+        return self._value(positions[-1])
+
+    def __contains__(self, key: typing.Any) -> bool:
+        return key in self._parse()
+
+    def keys(self) -> typing.KeysView:
+        return self._parse().keys()
+
+    def multi_items(self) -> typing.List[typing.Tuple[str, str]]:
+        self._parse()
+        return [(key, self._value(i)) for i, (key, value) in enumerate(self._list)]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self._parse())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.raw!r})"
+
+
 class UploadFile:
+    """
+    An uploaded file, spooled in memory up to `spool_max_size` bytes.
+
+    `size` and `sha256` are updated as the parts are written.
+    """
+
+    __slots__ = ("filename", "content_type", "size", "_hash", "file")
 
     spool_max_size = 1024 * 1024
 
     def __init__(
-        self, filename: str, file: typing.IO = None, content_type: str = ""
+        self, filename: str, file: typing.IO = None, content_type: str = "",
+        spool_max_size: int = None
     ) -> None:
         self.filename = filename
         self.content_type = content_type
+        self.size = 0
+        self._hash = hashlib.sha256()
         if file is None:
-            file = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
+            if spool_max_size is None:
+                spool_max_size = self.spool_max_size
+            file = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
         self.file = file
 
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
     @property
     def _in_memory(self) -> bool:
         rolled_to_disk = getattr(self.file, "_rolled", True)
         return not rolled_to_disk
 
+    def _track(self, data: typing.Union[bytes, str]) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.size += len(data)
+        self._hash.update(data)
+
     async def write(self, data: typing.Union[bytes, str]) -> None:
+        self._track(data)
         if self._in_memory:
             self.file.write(data)  # type: ignore
         else:
@@ -141,11 +287,50 @@ class UploadFile:
             await run_in_threadpool(self.file.close)
 
 
+class DiskUploadFile(UploadFile):
+    """
+    An uploaded file written straight to `path` as it is parsed.
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, filename: str, path: str, content_type: str = "") -> None:
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self.file = None
+
+    async def open(self) -> None:
+        if self.file is None:
+            self.file = await aiofiles.open(self.path, mode="w+b")
+
+    async def write(self, data: typing.Union[bytes, str]) -> None:
+        await self.open()
+        self._track(data)
+        await self.file.write(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        await self.open()
+        return await self.file.read(size)
+
+    async def seek(self, offset: int) -> None:
+        await self.open()
+        await self.file.seek(offset)
+
+    async def close(self) -> None:
+        if self.file is not None:
+            await self.file.close()
+
+
 class FormData(MultiDict):
     """
     An immutable multidict, containing both file uploads and text input.
     """
 
+    __slots__ = ()
+
     def __init__(
         self,
         *args: typing.Union[
@@ -170,20 +355,23 @@ class Store(object):
     Used for `request.store` and `ws.store`.
     """
 
+    __slots__ = ("_store",)
+
     def __init__(self, store: typing.Dict = None):
-        if store is None:
-            store = {}
+        # most requests never store anything, so the dict is made on first use
         super(Store, self).__setattr__("_store", store)
 
     def __setattr__(self, key: typing.Any, value: typing.Any) -> None:
+        if self._store is None:
+            super(Store, self).__setattr__("_store", {})
         self._store[key] = value
 
     def __getattr__(self, key: typing.Any) -> typing.Any:
         try:
             return self._store[key]
-        except KeyError:
+        except (KeyError, TypeError):
             message = "'{}' object has no attribute '{}'"
             raise AttributeError(message.format(self.__class__.__name__, key))
 
     def __delattr__(self, key: typing.Any) -> None:
-        del self._store[key]
+        del (self._store or {})[key]
@@ -1,28 +1,14 @@
+import os
 import typing
-from enum import Enum
+import uuid
 from urllib.parse import unquote_plus
-from renus.core.datastructures import FormData, UploadFile
+from renus.core.config import Config
+from renus.core.datastructures import FormData, UploadFile, DiskUploadFile
+from renus.core.injection import injection
+from renus.core.status import Status
 from multipart.multipart import parse_options_header
 import multipart
 
-class FormMessage(Enum):
-    FIELD_START = 1
-    FIELD_NAME = 2
-    FIELD_DATA = 3
-    FIELD_END = 4
-    END = 5
-
-
-class MultiPartMessage(Enum):
-    PART_BEGIN = 1
-    PART_DATA = 2
-    PART_END = 3
-    HEADER_FIELD = 4
-    HEADER_VALUE = 5
-    HEADER_END = 6
-    HEADERS_FINISHED = 7
-    END = 8
-
 
 def _user_safe_decode(src: bytes, codec: str) -> str:
     try:
@@ -31,33 +17,61 @@ def _user_safe_decode(src: bytes, codec: str) -> str:
         return src.decode("utf-8")
 
 
+# extensions an upload keeps in the public folder; anything a web server
+# could run or a browser render as a page (.php, .html, .svg) is dropped
+default_upload_extensions = [
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif",
+    ".pdf", ".txt", ".csv", ".zip",
+    ".mp3", ".ogg", ".wav", ".mp4", ".webm",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".ods",
+]
+
+
+def upload_path(directory: str, filename: str) -> str:
+    """
+    A fresh file name under `storage/<public_folder>/<directory>`. The
+    extension of the client's file name is kept only when it is in
+    `upload_extensions` from `config/app.json`.
+    """
+    config = Config("app")
+    folder = os.path.join("storage", config.get("public_folder", "public"), directory)
+    os.makedirs(folder, exist_ok=True)
+    extension = os.path.splitext(os.path.basename(filename))[1].lower()
+    if extension not in config.get("upload_extensions", default_upload_extensions):
+        extension = ""
+    return os.path.join(folder, uuid.uuid4().hex + extension)
+
+
 class FormParser:
+    """
+    `application/x-www-form-urlencoded` bodies. Names and values are
+    sanitized like JSON bodies.
+    """
+
     def __init__(
         self, headers, stream: typing.AsyncGenerator[bytes, None]
     ) -> None:
         self.headers = headers
         self.stream = stream
-        self.messages = []  # type: typing.List[typing.Tuple[FormMessage, bytes]]
+        self.injection = injection()
+        self.items = []  # type: typing.List[typing.Tuple[str, typing.Union[str, UploadFile]]]
+        self.field_name = bytearray()
+        self.field_value = bytearray()
 
     def on_field_start(self) -> None:
-        message = (FormMessage.FIELD_START, b"")
-        self.messages.append(message)
+        self.field_name.clear()
+        self.field_value.clear()
 
     def on_field_name(self, data: bytes, start: int, end: int) -> None:
-        message = (FormMessage.FIELD_NAME, data[start:end])
-        self.messages.append(message)
+        self.field_name += data[start:end]
 
     def on_field_data(self, data: bytes, start: int, end: int) -> None:
-        message = (FormMessage.FIELD_DATA, data[start:end])
-        self.messages.append(message)
+        self.field_value += data[start:end]
 
     def on_field_end(self) -> None:
-        message = (FormMessage.FIELD_END, b"")
-        self.messages.append(message)
-
-    def on_end(self) -> None:
-        message = (FormMessage.END, b"")
-        self.messages.append(message)
+        name = unquote_plus(self.field_name.decode("utf-8"))
+        value = unquote_plus(self.field_value.decode("utf-8"))
+        self.items.append((self.injection.escape(name), self.injection.escape(value)))
 
     async def parse(self) -> FormData:
         # Callbacks dictionary.
@@ -66,17 +80,10 @@ class FormParser:
             "on_field_name": self.on_field_name,
             "on_field_data": self.on_field_data,
             "on_field_end": self.on_field_end,
-            "on_end": self.on_end,
         }
 
         # Create the parser.
         parser = multipart.QuerystringParser(callbacks)
-        field_name = b""
-        field_value = b""
-
-        items = (
-            []
-        )  # type: typing.List[typing.Tuple[str, typing.Union[str, UploadFile]]]
 
         # Feed the parser with data from the request.
         async for chunk in self.stream:
@@ -84,68 +91,113 @@ class FormParser:
                 parser.write(chunk)
             else:
                 parser.finalize()
-            messages = list(self.messages)
-            self.messages.clear()
-            for message_type, message_bytes in messages:
-                if message_type == FormMessage.FIELD_START:
-                    field_name = b""
-                    field_value = b""
-                elif message_type == FormMessage.FIELD_NAME:
-                    field_name += message_bytes
-                elif message_type == FormMessage.FIELD_DATA:
-                    field_value += message_bytes
-                elif message_type == FormMessage.FIELD_END:
-                    name = unquote_plus(field_name.decode("utf-8"))
-                    value = unquote_plus(field_value.decode("utf-8"))
-                    items.append((name, value))
-                elif message_type == FormMessage.END:
-                    pass
-
-        return FormData(items)
+
+        return FormData(self.items)
 
 
 class MultiPartParser:
+    """
+    `upload` sends file parts somewhere other than a spooled temporary file:
+    a directory under `storage/<public_folder>`, or a callable
+    `(filename, content_type, field_name)` returning an `UploadFile`.
+    `spool` overrides `UploadFile.spool_max_size` for the default case.
+    More than `max_parts` parts (0 means no limit) aborts with a 413.
+    """
+
     def __init__(
-        self, headers, stream: typing.AsyncGenerator[bytes, None]
+        self, headers, stream: typing.AsyncGenerator[bytes, None],
+        upload: typing.Union[str, typing.Callable, None] = None, spool: int = None,
+        max_parts: int = 0
     ) -> None:
         assert (
             multipart is not None
         ), "The `python-multipart` library must be installed to use form parsing."
         self.headers = headers
         self.stream = stream
-        self.messages = []  # type: typing.List[typing.Tuple[MultiPartMessage, bytes]]
+        self.upload = upload
+        self.spool = spool
+        self.max_parts = max_parts
+        self.parts = 0
+        self.charset = "utf-8"
+        self.items = []  # type: typing.List[typing.Tuple[str, typing.Union[str, UploadFile]]]
+        # file writes are async, so the callbacks queue them for parse()
+        self.pending = []  # type: typing.List[typing.Tuple[UploadFile, typing.Optional[bytes]]]
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.content_disposition = None
+        self.content_type = b""
+        self.field_name = ""
+        self.data = bytearray()
+        self.file = None  # type: typing.Optional[UploadFile]
 
     def on_part_begin(self) -> None:
-        message = (MultiPartMessage.PART_BEGIN, b"")
-        self.messages.append(message)
+        self.parts += 1
+        if self.max_parts and self.parts > self.max_parts:
+            raise RuntimeError('too_many_parts', Status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.content_disposition = None
+        self.content_type = b""
+        self.data = bytearray()
 
     def on_part_data(self, data: bytes, start: int, end: int) -> None:
-        message = (MultiPartMessage.PART_DATA, data[start:end])
-        self.messages.append(message)
+        if self.file is None:
+            self.data += data[start:end]
+        else:
+            self.pending.append((self.file, data[start:end]))
 
     def on_part_end(self) -> None:
-        message = (MultiPartMessage.PART_END, b"")
-        self.messages.append(message)
+        if self.file is None:
+            self.items.append((self.field_name, _user_safe_decode(self.data, self.charset)))
+        else:
+            self.pending.append((self.file, None))
+            self.items.append((self.field_name, self.file))
 
     def on_header_field(self, data: bytes, start: int, end: int) -> None:
-        message = (MultiPartMessage.HEADER_FIELD, data[start:end])
-        self.messages.append(message)
+        self.header_field += data[start:end]
 
     def on_header_value(self, data: bytes, start: int, end: int) -> None:
-        message = (MultiPartMessage.HEADER_VALUE, data[start:end])
-        self.messages.append(message)
+        self.header_value += data[start:end]
 
     def on_header_end(self) -> None:
-        message = (MultiPartMessage.HEADER_END, b"")
-        self.messages.append(message)
+        field = self.header_field.lower()
+        if field == b"content-disposition":
+            self.content_disposition = bytes(self.header_value)
+        elif field == b"content-type":
+            self.content_type = bytes(self.header_value)
+        self.header_field.clear()
+        self.header_value.clear()
 
     def on_headers_finished(self) -> None:
-        message = (MultiPartMessage.HEADERS_FINISHED, b"")
-        self.messages.append(message)
-
-    def on_end(self) -> None:
-        message = (MultiPartMessage.END, b"")
-        self.messages.append(message)
+        disposition, options = parse_options_header(self.content_disposition)
+        self.field_name = _user_safe_decode(options[b"name"], self.charset)
+        if b"filename" in options:
+            filename = _user_safe_decode(options[b"filename"], self.charset)
+            self.file = self.make_file(filename, self.content_type.decode("utf-8"))
+        else:
+            self.file = None
+
+    def make_file(self, filename: str, content_type: str) -> UploadFile:
+        if self.upload is None:
+            return UploadFile(filename=filename, content_type=content_type, spool_max_size=self.spool)
+        if callable(self.upload):
+            return self.upload(filename, content_type, self.field_name)
+        return DiskUploadFile(filename, upload_path(self.upload, filename), content_type)
+
+    async def discard(self) -> None:
+        files = [value for key, value in self.items if isinstance(value, UploadFile)]
+        if self.file is not None and self.file not in files:
+            files.append(self.file)
+        for file in files:
+            await file.close()
+            if isinstance(file, DiskUploadFile) and os.path.exists(file.path):
+                os.remove(file.path)
+
+    async def flush(self) -> None:
+        for file, data in self.pending:
+            if data is None:
+                await file.seek(0)
+            else:
+                await file.write(data)
+        self.pending.clear()
 
     async def parse(self) -> FormData:
         # Parse the Content-Type header to get the multipart boundary.
@@ -153,6 +205,7 @@ class MultiPartParser:
         charset = params.get(b"charset", "utf-8")
         if type(charset) == bytes:
             charset = charset.decode("utf-8")
+        self.charset = charset
         boundary = params.get(b"boundary")
 
         # Callbacks dictionary.
@@ -164,69 +217,20 @@ class MultiPartParser:
             "on_header_value": self.on_header_value,
             "on_header_end": self.on_header_end,
             "on_headers_finished": self.on_headers_finished,
-            "on_end": self.on_end,
         }
 
         # Create the parser.
         parser = multipart.MultipartParser(boundary, callbacks)
-        header_field = b""
-        header_value = b""
-        content_disposition = None
-        content_type = b""
-        field_name = ""
-        data = b""
-        file = None  # type: typing.Optional[UploadFile]
-
-        items = (
-            []
-        )  # type: typing.List[typing.Tuple[str, typing.Union[str, UploadFile]]]
 
         # Feed the parser with data from the request.
-        async for chunk in self.stream:
-            parser.write(chunk)
-            messages = list(self.messages)
-            self.messages.clear()
-            for message_type, message_bytes in messages:
-                if message_type == MultiPartMessage.PART_BEGIN:
-                    content_disposition = None
-                    content_type = b""
-                    data = b""
-                elif message_type == MultiPartMessage.HEADER_FIELD:
-                    header_field += message_bytes
-                elif message_type == MultiPartMessage.HEADER_VALUE:
-                    header_value += message_bytes
-                elif message_type == MultiPartMessage.HEADER_END:
-                    field = header_field.lower()
-                    if field == b"content-disposition":
-                        content_disposition = header_value
-                    elif field == b"content-type":
-                        content_type = header_value
-                    header_field = b""
-                    header_value = b""
-                elif message_type == MultiPartMessage.HEADERS_FINISHED:
-                    disposition, options = parse_options_header(content_disposition)
-                    field_name = _user_safe_decode(options[b"name"], charset)
-                    if b"filename" in options:
-                        filename = _user_safe_decode(options[b"filename"], charset)
-                        file = UploadFile(
-                            filename=filename,
-                            content_type=content_type.decode("utf-8"),
-                        )
-                    else:
-                        file = None
-                elif message_type == MultiPartMessage.PART_DATA:
-                    if file is None:
-                        data += message_bytes
-                    else:
-                        await file.write(message_bytes)
-                elif message_type == MultiPartMessage.PART_END:
-                    if file is None:
-                        items.append((field_name, _user_safe_decode(data, charset)))
-                    else:
-                        await file.seek(0)
-                        items.append((field_name, file))
-                elif message_type == MultiPartMessage.END:
-                    pass
-
-        parser.finalize()
-        return FormData(items)
+        try:
+            async for chunk in self.stream:
+                parser.write(chunk)
+                await self.flush()
+
+            parser.finalize()
+            await self.flush()
+        except Exception:
+            await self.discard()
+            raise
+        return FormData(self.items)
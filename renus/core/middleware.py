@@ -1,23 +1,46 @@
-def check(middleware:str,request):
-    middleware=middleware.split(':')
-    cls=import_by_string(middleware[0])()
-    return cls.handle(request,*middleware[1:])
+import inspect
 
 
 def import_by_string(middleware):
     return getattr(__import__(f"app.middlewares.{middleware}", fromlist=['']),middleware.title())
 
-class Middleware:
-    def __init__(self, request, middlewares=None) -> None:
+
+instances = {}
+
+
+def resolve(middleware: str):
+    """
+    Middleware instances are created once and shared by every pipeline.
+    """
+    instance = instances.get(middleware)
+    if instance is None:
+        instance = instances[middleware] = import_by_string(middleware)()
+    return instance
+
+
+class Pipeline:
+    """
+    A list of `name:arg1:arg2` middlewares parsed and resolved once.
+    `handle` may be a plain or an `async def` method.
+    """
+
+    def __init__(self, middlewares=None) -> None:
         if middlewares is None:
             middlewares = []
-        self.middlewares = middlewares
-        self.request = request
-
-    def next(self):
+        self.middlewares = list(middlewares)
+        self.steps = []
         for middleware in self.middlewares:
-            handle=check(middleware,self.request)
-            if handle.get('pass',False) is not True:
-                return {'middleware':middleware,'msg':handle.get('msg',None)}
+            name, *args = middleware.split(':')
+            handle = resolve(name).handle
+            self.steps.append((middleware, handle, args, inspect.iscoroutinefunction(handle)))
+
+    async def __call__(self, request):
+        for middleware, handle, args, is_async in self.steps:
+            if is_async:
+                result = await handle(request, *args)
+            else:
+                result = handle(request, *args)
+            if result.get('pass', False) is not True:
+                return {'middleware': middleware, 'msg': result.get('msg', None)}
 
         return True
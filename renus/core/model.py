@@ -10,6 +10,9 @@ from renus.core.request import Request
 
 class ModelBase:
     metro = None
+    # cast ObjectId/datetime fields to str; the JSON codec can encode them
+    # itself, so models may turn this off
+    cast = True
 
     def __init__(self, collection_name: str, request: Request) -> None:
         self._request = request
@@ -131,6 +134,8 @@ class ModelBase:
         for field in self.hidden_fields:
             if field in document:
                 del document[field]
+        if not self.cast:
+            return document
         for field in self.cast_fields:
             if field in document:
                 if type(document[field]) is dict:
@@ -1,37 +1,66 @@
 import html
-import typing,json
+import typing
 
 from multipart.multipart import parse_options_header
 from http import cookies as http_cookies
-from urllib.parse import parse_qsl
 
 from renus.core.formparsers import FormParser, MultiPartParser
-from renus.core.injection import Injection
-from renus.core.datastructures import Store
+from renus.core.injection import injection
+from renus.core.codec import codec
+from renus.core.config import Config
+from renus.core.status import Status
+from renus.core.datastructures import Store, Headers, QueryParams
+
+unset = object()
+
 
 class Request:
+    # `__dict__` keeps ad-hoc attributes (`request.user = ...`) working; the
+    # dict is only created when one is set, `request.store` is the better home
+    __slots__ = (
+        "_scope", "_receive", "_headers", "_stream_consumed", "_is_disconnected",
+        "_cookies", "_base_path", "_full_path", "_query_params", "_body", "_form",
+        "store", "route", "__dict__",
+    )
+
     def __init__(self,scope,receive) -> None:
         self._scope=scope
         self._receive=receive
-        self._headers=headers_parser(self._scope['headers'])
+        self._headers=Headers(self._scope['headers'])
         self._stream_consumed=False
+        self._is_disconnected=False
+        self._cookies=unset
+        self._base_path=unset
+        self._full_path=unset
+        self._query_params=unset
+        self._body=unset
+        self._form=unset
         self.store=Store()
+        self.route=None
 
     @property
     def app(self) -> typing.Any:
         return self._scope["app"]
 
+    @property
+    def scope(self):
+        return self._scope
+
+    @property
+    def receive(self):
+        return self._receive
+
     @property
     def headers(self) -> typing.Any:
         return self._headers
 
     @property
     def cookies(self):
-        if not hasattr(self, "_cookies"):
+        if self._cookies is unset:
             headers = self.headers
             self._cookies =[]
             if 'cookie' in headers:
-                self._cookies= cookie_parser(headers['cookie'])
+                self._cookies= cookie_parser('; '.join(headers.getlist('cookie')))
 
         return self._cookies
 
@@ -49,7 +78,7 @@ class Request:
 
     @property
     def base_path(self):
-        if not hasattr(self, "_base_path"):
+        if self._base_path is unset:
             headers = self.headers
             scheme = self._scope.get("scheme", "http")
             server = self._scope.get("server", None)
@@ -75,7 +104,7 @@ class Request:
 
     @property
     def full_path(self):
-        if not hasattr(self, "_full_path"):
+        if self._full_path is unset:
             path = self._scope.get("root_path", "") + self._scope["path"]
             query_string = self._scope.get("query_string", b"")
             url = self.base_path
@@ -88,16 +117,47 @@ class Request:
 
     @property
     def query_params(self) :
-        if not hasattr(self, "_query_params"):
-            self._query_params= query_parser(self._scope['query_string'])
+        if self._query_params is unset:
+            self._query_params= QueryParams(self._scope['query_string'])
         return self._query_params
 
     @property
     def method(self) -> str:
         return self._scope["method"]
 
+    def limit(self, key: str, config_key: str):
+        route = self.route or {}
+        value = route.get(key)
+        if value is None:
+            value = Config('app', self).get(config_key, 0)
+        return value
+
+    @property
+    def max_body_size(self) -> int:
+        """
+        The route's `max_body`, else `max_body_size` from the app config.
+        0 means no limit.
+        """
+        return self.limit('max_body', 'max_body_size')
+
+    @property
+    def max_parts(self) -> int:
+        return self.limit('max_parts', 'max_parts')
+
+    def check_content_length(self) -> None:
+        limit = self.max_body_size
+        length = self.headers.get("content-length")
+        if not limit or length is None:
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            raise RuntimeError('invalid_content_length', Status.HTTP_400_BAD_REQUEST)
+        if length > limit:
+            raise RuntimeError('request_entity_too_large', Status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
     async def stream(self) -> typing.AsyncGenerator[bytes, None]:
-        if hasattr(self, "_body"):
+        if self._body is not unset:
             yield self._body
             yield b""
             return
@@ -105,12 +165,18 @@ class Request:
         if self._stream_consumed:
             raise RuntimeError("Stream consumed")
 
+        self.check_content_length()
         self._stream_consumed = True
+        limit = self.max_body_size
+        received = 0
         while True:
             message = await self._receive()
             if message["type"] == "http.request":
                 body = message.get("body", b"")
                 if body:
+                    received += len(body)
+                    if limit and received > limit:
+                        raise RuntimeError('request_entity_too_large', Status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
                     yield body
                 if not message.get("more_body", False):
                     break
@@ -120,42 +186,77 @@ class Request:
         yield b""
 
     async def body(self) -> bytes:
-        if not hasattr(self, "_body"):
+        if self._body is unset:
             chunks = []
             async for chunk in self.stream():
                 chunks.append(chunk)
             self._body = b"".join(chunks)
         return self._body
 
+    @property
+    def content_type(self) -> bytes:
+        content_type, options = parse_options_header(self.headers.get("content-type"))
+        return content_type
+
     async def form(self):
-        if not hasattr(self, "_form"):
-            content_type_header = self.headers.get("content-type")
-            content_type, options = parse_options_header(content_type_header)
+        if self._form is unset:
+            content_type = self.content_type
             if content_type == b"multipart/form-data":
-                multipart_parser = MultiPartParser(self.headers, self.stream())
+                route = self.route or {}
+                multipart_parser = MultiPartParser(self.headers, self.stream(),
+                                                   route.get("upload"), route.get("spool"),
+                                                   self.max_parts)
                 self._form = await multipart_parser.parse()
-            elif content_type == b"app/x-www-form-urlencoded":
+            elif content_type == b"application/x-www-form-urlencoded":
                 form_parser = FormParser(self.headers, self.stream())
                 self._form = await form_parser.parse()
             else:
-                body=await self.body()
-                try:
-                    self._form ={} if body == b"" else json.loads(body)
-                except Exception:
-                    self._form ={}
+                self._form = json_parser(await self.body())
+
+        return self._form
 
-                self._form =Injection().protect(self._form)
+    async def load(self) -> None:
+        """
+        Read the body once. Forms are parsed right away, JSON bodies on the
+        first `inputs` access.
+        """
+        if self.content_type in (b"multipart/form-data", b"application/x-www-form-urlencoded"):
+            await self.form()
+        else:
+            await self.body()
+
+    async def get_inputs(self):
+        """
+        `inputs`, reading the body first if it is not loaded yet.
 
+        Middlewares run before the body is read, so a request they reject
+        never reads it; one that needs the body (a CSRF or signature check)
+        awaits this from an `async def handle`.
+        """
+        await self.load()
+        return self.inputs
 
+    @property
+    def inputs(self):
+        if self._form is unset:
+            if self._body is unset:
+                raise RuntimeError("Request body is not loaded, use `await request.get_inputs()`.")
+            self._form = json_parser(self._body)
         return self._form
 
+    @inputs.setter
+    def inputs(self, value) -> None:
+        self._form = value
 
-def headers_parser(headers: list) -> typing.Dict[str, str]:
-    headers_dict: typing.Dict[str, str] = {}
-    for header in headers:
-        headers_dict[html.escape(str(header[0].decode("utf-8")).lower())]=html.escape(header[1].decode("utf-8"))
 
-    return headers_dict
+def json_parser(body: bytes):
+    try:
+        form = {} if body == b"" else codec().loads(body)
+    except Exception:
+        form = {}
+
+    return injection().protect(form)
+
 
 def cookie_parser(cookie_string: str) -> typing.Dict[str, str]:
     cookie_dict: typing.Dict[str, str] = {}
@@ -170,12 +271,6 @@ def cookie_parser(cookie_string: str) -> typing.Dict[str, str]:
             cookie_dict[key] = http_cookies._unquote(val)
     return cookie_dict
 
-def query_parser(query_string:str):
-    params=parse_qsl(query_string.decode("utf-8"), keep_blank_values=True)
-    params={k: v for k, v in params}
-    params=Injection().protect(params)
-    return params
-
 
 class ClientDisconnect(Exception):
     pass
@@ -1,24 +1,93 @@
+import asyncio
 import hashlib
-import io
 import json
+import mmap
 import os
 import stat
+import time
 import http.cookies
 import typing
 import inspect
 import aiofiles
-import gzip
 from aiofiles.os import stat as aio_stat
-from email.utils import formatdate
+from email.utils import formatdate, parsedate_to_datetime
 from mimetypes import guess_type
+from collections import OrderedDict
 from urllib.parse import quote, quote_plus
 
 from renus.core.status import Status
 from renus.core.config import Config
-from renus.core.concurrency import iterate_in_threadpool, run_until_first_complete
+from renus.core.codec import codec
+from renus.core.compression import StreamCompressor, compressor, content_type
+from renus.core.concurrency import iterate_in_threadpool, run_in_threadpool, run_until_first_complete
 from renus.core.datastructures import Background
 
 
+def scope_header(scope, name: bytes) -> str:
+    """
+    Read header `name` from the scope of the request being answered.
+    """
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def accept_encoding(scope) -> str:
+    return scope_header(scope, b"accept-encoding")
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Weak `If-None-Match` comparison; a `-<encoding>` suffix names a
+    compressed variant of the same body.
+    """
+    for value in header.split(","):
+        value = value.strip()
+        if value == "*":
+            return True
+        if value.startswith("W/"):
+            value = value[2:]
+        if value.strip('"').split("-", 1)[0].lower() == etag:
+            return True
+    return False
+
+
+def not_modified_headers(raw_headers: typing.List[typing.Tuple[bytes, bytes]]) -> typing.List[typing.Tuple[bytes, bytes]]:
+    return [(k, v) for k, v in raw_headers if not k.lower().startswith(b"content-")]
+
+
+def parse_range(header: str, size: int, max_ranges: int = 16) -> typing.Optional[typing.List[typing.Tuple[int, int]]]:
+    """
+    `bytes=0-99,-500` as `[(start, end), ...]` with `end` exclusive.
+    None when the header should be ignored, [] when nothing is satisfiable.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        if not spec.strip():
+            continue
+        first, dash, last = spec.strip().partition("-")
+        if not dash or not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+            return None
+        if first == "":
+            if last == "":
+                return None
+            start, end = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            end = size if last == "" else min(int(last) + 1, size)
+            if last != "" and int(last) < start:
+                return None
+        if start < end:
+            ranges.append((start, end))
+    if len(ranges) > max_ranges:
+        return None
+    return ranges
+
+
 class Response:
     media_type = "text/html"  # "application/json" "text/plain"
     charset = "utf-8"
@@ -30,6 +99,7 @@ class Response:
             headers: dict = None,
             media_type: str = None,
             background: Background = None,
+            etag: bool = None,
     ) -> None:
         self.status_code = status_code
         if media_type is not None:
@@ -37,6 +107,7 @@ class Response:
         self.body = self.render(content)
         self.init_headers(headers)
         self.background = background
+        self.strong_etag = Config('app').get('etag', False) if etag is None else etag
 
     def render(self, content: typing.Any) -> bytes:
         if content is None:
@@ -64,7 +135,8 @@ class Response:
                 content_type += "; charset=" + self.charset
             raw_headers.append((b"content-type", content_type.encode("utf-8")))
 
-        if Config('app').get('env') == 'local' and Config('app').get('debug') == True:
+        config = Config('app')
+        if config.get('env', '') == 'local' and config.get('debug', False) == True:
             raw_headers.append((b"Access-Control-Allow-Headers", b'*'))
             raw_headers.append((b"Access-Control-Allow-Origin", b'*'))
             raw_headers.append((b"Access-Control-Expose-Headers", b'date, server, access-control-allow-origin, access-control-allow-headers, content-type, transfer-encoding'))
@@ -110,29 +182,168 @@ class Response:
     def delete_cookie(self, key: str, path: str = "/", domain: str = None) -> None:
         self.set_cookie(key, expires=0, max_age=0, path=path, domain=domain)
 
+    async def compress(self, encoding: str, body: bytes) -> bytes:
+        return await compressor().acompress(encoding, body)
+
+    def body_etag(self) -> str:
+        return hashlib.blake2b(self.body, digest_size=16).hexdigest()
+
+    async def not_modified(self, send, raw_headers) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": Status.HTTP_304_NOT_MODIFIED,
+                "headers": not_modified_headers(raw_headers),
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+
     async def __call__(self, scope, receive, send) -> None:
-        headers=scope['app'].request.headers
-        if "gzip" in headers.get("accept-encoding", "") and len(self.body) > 500:
-            self.gzip_buffer = io.BytesIO()
-            self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.gzip_buffer)
-            self.gzip_file.write(self.body)
-            self.gzip_file.close()
-            self.body = self.gzip_buffer.getvalue()
-            self.raw_headers.append((b"content-encoding", "gzip".encode("utf-8")))
-        self.raw_headers.append((b"content-length", str(len(self.body)).encode("utf-8")))
+        body = self.body
+        raw_headers = list(self.raw_headers)
+        encoding = None
+        compression = compressor()
+        if (compression.eligible(content_type(raw_headers), len(body))
+                and not any(k.lower() == b"content-encoding" for k, v in raw_headers)):
+            raw_headers.append((b"vary", b"Accept-Encoding"))
+            encoding = compression.negotiate(accept_encoding(scope))
+
+        if self.strong_etag and self.status_code == 200:
+            etag = self.body_etag()
+            raw_headers.append((b"etag", f'"{etag}-{encoding}"'.encode("utf-8") if encoding
+                                else f'"{etag}"'.encode("utf-8")))
+            if_none_match = scope_header(scope, b"if-none-match")
+            if (if_none_match and scope.get("method", "GET") in ("GET", "HEAD")
+                    and etag_matches(if_none_match, etag)):
+                await self.not_modified(send, raw_headers)
+                if self.background is not None:
+                    await self.background()
+                return
+
+        if encoding is not None:
+            body = await self.compress(encoding, body)
+            raw_headers.append((b"content-encoding", encoding.encode("utf-8")))
+        raw_headers.append((b"content-length", str(len(body)).encode("utf-8")))
         await send(
             {
                 "type": "http.response.start",
                 "status": self.status_code,
-                "headers": self.raw_headers,
+                "headers": raw_headers,
             }
         )
-        await send({"type": "http.response.body", "body": self.body})
+        await send({"type": "http.response.body", "body": body})
 
         if self.background is not None:
             await self.background()
 
 
+class CachedResponse(Response):
+    """
+    A response served from `ResponseCache`; each compressed variant of the
+    body is computed once per entry and reused.
+    """
+
+    def __init__(self, entry: dict) -> None:
+        self.entry = entry
+        self.status_code = entry["status_code"]
+        self.raw_headers = entry["raw_headers"]
+        self.body = entry["body"]
+        self.background = None
+        self.strong_etag = entry["strong_etag"]
+
+    def body_etag(self) -> str:
+        if self.entry["etag"] is None:
+            self.entry["etag"] = super().body_etag()
+        return self.entry["etag"]
+
+    async def compress(self, encoding: str, body: bytes) -> bytes:
+        encoded = self.entry["encoded"]
+        if encoding not in encoded:
+            encoded[encoding] = await super().compress(encoding, body)
+        return encoded[encoding]
+
+
+default_vary_headers = ["authorization", "cookie"]
+
+
+class ResponseCache:
+    """
+    In-process TTL cache for GET routes declared with `cache=<seconds>`.
+
+    Entries are keyed by path, query string and the `cache_vary_headers`
+    configured in `config/app.json`, and the least recently used entry is
+    dropped once `size` entries are stored. The default vary list is
+    `["authorization", "cookie"]`, so a route behind auth never serves one
+    caller's response to another; a custom list should keep both unless
+    the cached routes answer every caller the same.
+    """
+
+    def __init__(self, size: int = 512) -> None:
+        self.size = size
+        self._entries = OrderedDict()
+
+    def key(self, request) -> tuple:
+        vary = Config('app').get('cache_vary_headers', default_vary_headers)
+        return (
+            request.scope["path"],
+            request.scope.get("query_string", b""),
+            tuple(request.headers.get(header.lower(), None) for header in vary),
+        )
+
+    def get(self, key: tuple) -> typing.Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expire"] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return CachedResponse(entry)
+
+    def put(self, key: tuple, response: typing.Any, seconds: int) -> typing.Any:
+        """
+        Store `response` and return the object to send in its place.
+        Only complete 200 responses without cookies or background tasks are stored.
+        """
+        if (not isinstance(response, Response)
+                or isinstance(response, (StreamingResponse, FileResponse))
+                or response.status_code != 200
+                or response.background is not None
+                or any(k == b"set-cookie" for k, v in response.raw_headers)):
+            return response
+
+        self._entries[key] = {
+            "expire": time.monotonic() + seconds,
+            "status_code": response.status_code,
+            "raw_headers": list(response.raw_headers),
+            "body": response.body,
+            "encoded": {},
+            "strong_etag": response.strong_etag,
+            "etag": None,
+        }
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return CachedResponse(self._entries[key])
+
+    def purge(self, path: str = None, prefix: bool = False) -> int:
+        """
+        Drop every entry (no path), the entries of `path`, or with `prefix`
+        every entry whose path starts with `path`. Returns the number dropped.
+        """
+        if path is None:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+        path = path if path == '/' else path.rstrip(' /')
+        keys = [key for key in self._entries
+                if key[0] == path or (prefix and key[0].startswith(path))]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+
 class HtmlResponse(Response):
     media_type = "text/html"
 
@@ -156,13 +367,7 @@ class JsonResponse(Response):
         if isinstance(content, bytes):
             return content
 
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=True,
-            indent=None,
-            separators=(",", ":"),
-        ).encode("utf-8")
+        return codec().dumps(content)
 
 class JsonResponseRedirect(Response):
 
@@ -225,14 +430,19 @@ class StreamingResponse(Response):
             if message["type"] == "http.disconnect":
                 break
 
+    def stream_compressor(self, compression, encoding: str) -> StreamCompressor:
+        return compression.stream(encoding)
+
     async def stream_response(self,scope, send) -> None:
-        headers=scope['app'].request.headers
-        is_zip=False
-        if "gzip" in headers.get("accept-encoding", ""):
-            is_zip = True
-            self.gzip_buffer = io.BytesIO()
-            self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.gzip_buffer)
-            self.raw_headers.append((b"content-encoding", "gzip".encode("utf-8")))
+        stream = None
+        compression = compressor()
+        if (compression.allowed(content_type(self.raw_headers))
+                and not any(k.lower() == b"content-encoding" for k, v in self.raw_headers)):
+            self.raw_headers.append((b"vary", b"Accept-Encoding"))
+            encoding = compression.negotiate(accept_encoding(scope), ("gzip", "deflate"))
+            if encoding is not None:
+                stream = self.stream_compressor(compression, encoding)
+                self.raw_headers.append((b"content-encoding", encoding.encode("utf-8")))
 
         await send(
             {
@@ -241,24 +451,45 @@ class StreamingResponse(Response):
                 "headers": self.raw_headers,
             }
         )
-        async for chunk in self.body_iterator:
-            if is_zip:
-                self.gzip_file.write(chunk)
-                chunk = self.gzip_buffer.getvalue()
-                self.gzip_buffer.seek(0)
-                self.gzip_buffer.truncate()
-
-            if not isinstance(chunk, bytes):
-                chunk = chunk.encode(self.charset)
-
-            await send({"type": "http.response.body", "body": chunk, "more_body": True})
-        chunk=b""
-        if is_zip:
-            self.gzip_file.write(chunk)
-            self.gzip_file.close()
-            chunk = self.gzip_buffer.getvalue()
-            self.gzip_buffer.seek(0)
-            self.gzip_buffer.truncate()
+        iterator = self.body_iterator.__aiter__()
+        # with a flush interval, the next chunk is awaited in a task so that
+        # buffered output can be flushed on time while the stream is quiet
+        pending = None
+        try:
+            while True:
+                timeout = None if stream is None else stream.flush_timeout()
+                if pending is None and timeout is None:
+                    try:
+                        chunk = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                else:
+                    if pending is None:
+                        pending = asyncio.ensure_future(iterator.__anext__())
+                    if timeout is not None:
+                        finished, unfinished = await asyncio.wait((pending,), timeout=timeout)
+                        if not finished:
+                            await send({"type": "http.response.body", "body": stream.flush(), "more_body": True})
+                            continue
+                    try:
+                        chunk = await pending
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        pending = None
+
+                if not isinstance(chunk, bytes):
+                    chunk = chunk.encode(self.charset)
+                if stream is not None:
+                    chunk = stream.compress(chunk)
+                    if not chunk:
+                        continue
+
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            if pending is not None:
+                pending.cancel()
+        chunk = b"" if stream is None else stream.finish()
         await send({"type": "http.response.body", "body":chunk, "more_body": False})
 
     async def __call__(self, scope, receive, send) -> None:
@@ -270,8 +501,141 @@ class StreamingResponse(Response):
             await self.background()
 
 
+class EventSourceResponse(StreamingResponse):
+    """
+    A `text/event-stream` of server-sent events.
+
+    `content` is an async iterable of events, or a callable taking the
+    client's `Last-Event-ID` (None on the first connection) and returning
+    one. An event is a str, or a dict with `data`, `event`, `id`, `retry`
+    and `comment` keys. A `: ping` comment is sent after `ping` seconds
+    without events.
+
+    Events wait for the client in a queue of `queue_size`. When it is full,
+    `overflow` decides: `wait` pauses the producer, `drop` discards the
+    oldest queued event and `close` stops producing, sends what is queued
+    and ends the stream.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(
+            self,
+            content: typing.Any,
+            status_code: Status = Status.HTTP_200_OK,
+            headers: dict = None,
+            background: Background = None,
+            ping: float = 15,
+            queue_size: int = 64,
+            overflow: str = "wait",
+    ) -> None:
+        assert overflow in ["wait", "drop", "close"], "overflow must be either 'wait', 'drop' or 'close'"
+        headers = {} if headers is None else dict(headers)
+        headers.setdefault("cache-control", "no-cache")
+        headers.setdefault("x-accel-buffering", "no")
+        self.content = content
+        self.ping = ping
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.last_event_id = None
+        self._producer = None
+        # the body iterator is built from `content` per call, so
+        # StreamingResponse.__init__ is skipped
+        Response.__init__(self, status_code=status_code, headers=headers, background=background)
+        self.body_iterator = None
+
+    @staticmethod
+    def format(event: typing.Any) -> bytes:
+        if not isinstance(event, dict):
+            event = {"data": event}
+        lines = []
+        if event.get("comment") is not None:
+            lines.extend(": " + line for line in str(event["comment"]).splitlines())
+        for field in ("id", "event", "retry"):
+            if event.get(field) is not None:
+                lines.append(f"{field}: {event[field]}")
+        if event.get("data") is not None:
+            data = event["data"]
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            lines.extend("data: " + line for line in str(data).splitlines() or [""])
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+    def stream_compressor(self, compression, encoding: str) -> StreamCompressor:
+        # every event has to reach the client as soon as it is sent
+        return StreamCompressor(encoding, compression.levels.get(encoding, 6))
+
+    async def produce(self, content, queue: asyncio.Queue, done: object) -> None:
+        try:
+            async for event in content:
+                # a put into a free slot never yields, so let the client take
+                # what it can first: only a client that falls behind should
+                # fill the queue, not a producer replaying a backlog
+                await asyncio.sleep(0)
+                if queue.full():
+                    if self.overflow == "drop":
+                        queue.get_nowait()
+                    elif self.overflow == "close":
+                        break
+                await queue.put(self.format(event))
+        finally:
+            # a full queue is drained first, the consumer then sees the task is done
+            if not queue.full():
+                queue.put_nowait(done)
+
+    async def events(self, content) -> typing.AsyncGenerator[bytes, None]:
+        queue = asyncio.Queue(self.queue_size)
+        done = object()
+        self._producer = asyncio.ensure_future(self.produce(content, queue, done))
+        while not (queue.empty() and self._producer.done()):
+            try:
+                # wait_for runs get() in a task, which takes extra loop turns
+                if not queue.empty():
+                    item = queue.get_nowait()
+                elif self.ping:
+                    item = await asyncio.wait_for(queue.get(), self.ping)
+                else:
+                    item = await queue.get()
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if item is done:
+                break
+            yield item
+        # raises what the producer raised
+        await self._producer
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.last_event_id = scope_header(scope, b"last-event-id") or None
+        content = self.content
+        if callable(content) and not hasattr(content, "__aiter__"):
+            content = content(self.last_event_id)
+        self.body_iterator = self.events(content)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self._producer is not None:
+                self._producer.cancel()
+
+
 class FileResponse(Response):
-    chunk_size = 4096
+    """
+    Sends a file with `http.response.pathsend` or `http.response.zerocopysend`
+    when the server lists them in `scope["extensions"]`. Otherwise the file
+    is read in chunks of `chunk_size`, or when that is None a size between
+    `min_chunk_size` and `max_chunk_size` picked from the length sent.
+
+    Setting `mmap_min_size` memory-maps files of that many bytes or more.
+    Only do so for files that are always replaced atomically (write and
+    rename): a mapped file truncated during a download kills the worker
+    with SIGBUS.
+    """
+
+    chunk_size = None
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 1024 * 1024
+    mmap_min_size = None
+    max_ranges = 16
 
     def __init__(
             self,
@@ -304,38 +668,209 @@ class FileResponse(Response):
                 content_disposition = 'attachment; filename="{}"'.format(self.filename)
             self.raw_headers.append((b"content-disposition", content_disposition.lower().encode("utf-8")))
         self.stat_result = stat_result
-        if stat_result is not None:
-            self.set_stat_headers(stat_result,False)
 
-    def set_stat_headers(self, stat_result: os.stat_result,is_zip) -> None:
-        content_length = str(stat_result.st_size)
-        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    @staticmethod
+    def etag(stat_result: os.stat_result) -> str:
         etag_base = str(stat_result.st_mtime) + "-" + str(stat_result.st_size)
-        etag = hashlib.md5(etag_base.encode()).hexdigest()
-        if not is_zip:
-            self.raw_headers.append((b"content-length", content_length.lower().encode("utf-8")))
+        return hashlib.md5(etag_base.encode()).hexdigest()
+
+    def set_stat_headers(self, stat_result: os.stat_result, encoding: str = None,
+                         size: int = None) -> None:
+        content_length = str(stat_result.st_size if size is None else size)
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        etag = self.etag(stat_result)
+        if encoding is not None:
+            etag += "-" + encoding
+        self.raw_headers.append((b"content-length", content_length.lower().encode("utf-8")))
         self.raw_headers.append((b"last-modified", last_modified.lower().encode("utf-8")))
-        self.raw_headers.append((b"etag", etag.lower().encode("utf-8")))
+        self.raw_headers.append((b"etag", f'"{etag.lower()}"'.encode("utf-8")))
+
+    def is_not_modified(self, scope, stat_result: os.stat_result) -> bool:
+        if self.status_code != 200 or scope.get("method", "GET") not in ("GET", "HEAD"):
+            return False
+        if_none_match = scope_header(scope, b"if-none-match")
+        if if_none_match:
+            return etag_matches(if_none_match, self.etag(stat_result))
+        if_modified_since = scope_header(scope, b"if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError):
+                return False
+            return int(stat_result.st_mtime) <= since
+        return False
+
+    def ranges(self, scope, stat_result: os.stat_result) -> typing.Optional[typing.List[typing.Tuple[int, int]]]:
+        """
+        The byte ranges to send, honouring `If-Range`; None for the whole file.
+        """
+        header = scope_header(scope, b"range")
+        if not header or self.status_code != 200:
+            return None
+        if_range = scope_header(scope, b"if-range").strip()
+        if if_range:
+            # a strong comparison: a weak `W/` validator never matches; the
+            # ETag may come back quoted or, from older clients, bare
+            if if_range.startswith("W/"):
+                return None
+            if if_range.strip('"') != self.etag(stat_result) \
+                    and if_range.lower() != formatdate(stat_result.st_mtime, usegmt=True).lower():
+                return None
+        return parse_range(header, stat_result.st_size, self.max_ranges)
+
+    def read_size(self, length: int) -> int:
+        if self.chunk_size:
+            return self.chunk_size
+        return max(self.min_chunk_size, min(self.max_chunk_size, length // 8))
+
+    @staticmethod
+    def map_file(path: str) -> mmap.mmap:
+        with open(path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        return mapped
+
+    async def send_file(self, scope, send, path: str, parts: typing.List[typing.Tuple[bytes, int, int]],
+                        closing: bytes = b"") -> None:
+        """
+        Send the `(head, start, end)` windows of `path`, each preceded by
+        `head` and followed by CRLF when `head` is set, then `closing`.
+        """
+        extensions = scope.get("extensions") or {}
+        length = sum(end - start for head, start, end in parts)
+        if "http.response.zerocopysend" in extensions:
+            file = await run_in_threadpool(open, path, "rb")
+            try:
+                for head, start, end in parts:
+                    if head:
+                        await send({"type": "http.response.body", "body": head, "more_body": True})
+                    await send({"type": "http.response.zerocopysend", "file": file,
+                                "offset": start, "count": end - start, "more_body": True})
+                    if head:
+                        await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            finally:
+                file.close()
+        elif self.mmap_min_size and length >= self.mmap_min_size:
+            chunk_size = self.read_size(length)
+            mapped = await run_in_threadpool(self.map_file, path)
+            advise = hasattr(mapped, "madvise")
+            try:
+                for head, start, end in parts:
+                    if head:
+                        await send({"type": "http.response.body", "body": head, "more_body": True})
+                    position = start
+                    while position < end:
+                        stop = min(position + chunk_size, end)
+                        if advise and stop < end:
+                            # let the kernel read the next window while this one is sent
+                            page = stop - stop % mmap.PAGESIZE
+                            mapped.madvise(mmap.MADV_WILLNEED, page, min(chunk_size, len(mapped) - page))
+                        await send({"type": "http.response.body", "body": mapped[position:stop],
+                                    "more_body": True})
+                        position = stop
+                    if head:
+                        await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            finally:
+                mapped.close()
+        else:
+            chunk_size = self.read_size(length)
+            async with aiofiles.open(path, mode="rb") as file:
+                for head, start, end in parts:
+                    if head:
+                        await send({"type": "http.response.body", "body": head, "more_body": True})
+                    await file.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = await file.read(min(chunk_size, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    if head:
+                        await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+        await send({"type": "http.response.body", "body": closing, "more_body": False})
+
+    async def send_ranges(self, scope, send, ranges: typing.List[typing.Tuple[int, int]],
+                          stat_result: os.stat_result) -> None:
+        size = stat_result.st_size
+        if not ranges:
+            self.raw_headers.append((b"content-range", f"bytes */{size}".encode("utf-8")))
+            self.raw_headers.append((b"content-length", b"0"))
+            await send({"type": "http.response.start", "status": Status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                        "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.raw_headers.append((b"content-range", f"bytes {start}-{end - 1}/{size}".encode("utf-8")))
+            self.set_stat_headers(stat_result, size=end - start)
+            parts = [(b"", start, end)]
+            closing = b""
+        else:
+            boundary = hashlib.md5(os.urandom(16)).hexdigest()
+            media_type = content_type(self.raw_headers) or self.media_type
+            self.raw_headers = [(k, v) for k, v in self.raw_headers if k != b"content-type"]
+            self.raw_headers.append((b"content-type", f"multipart/byteranges; boundary={boundary}".encode("utf-8")))
+            parts = [(
+                f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n".encode("utf-8"),
+                start, end,
+            ) for start, end in ranges]
+            closing = f"--{boundary}--\r\n".encode("utf-8")
+            length = sum(len(head) + end - start + 2 for head, start, end in parts) + len(closing)
+            self.set_stat_headers(stat_result, size=length)
+
+        await send({"type": "http.response.start", "status": Status.HTTP_206_PARTIAL_CONTENT,
+                    "headers": self.raw_headers})
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await self.send_file(scope, send, self.path, parts, closing)
 
     async def __call__(self, scope, receive, send) -> None:
-        headers=scope['app'].request.headers
-        is_zip = False
-        if "gzip" in headers.get("accept-encoding", "") and not self.send_header_only:
-            is_zip = True
-            self.gzip_buffer = io.BytesIO()
-            self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.gzip_buffer)
-            self.raw_headers.append((b"content-encoding", "gzip".encode("utf-8")))
-
-        if self.stat_result is None:
+        stat_result = self.stat_result
+        if stat_result is None:
             try:
                 stat_result = await aio_stat(self.path)
-                self.set_stat_headers(stat_result,is_zip)
             except FileNotFoundError:
                 raise RuntimeError(f"File at path {self.path} does not exist.")
             else:
                 mode = stat_result.st_mode
                 if not stat.S_ISREG(mode):
                     raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        self.raw_headers.append((b"accept-ranges", b"bytes"))
+        compression = compressor()
+        compressible = compression.allowed(self.media_type) and stat_result.st_size >= compression.min_size
+        if compressible:
+            # on every status, so caches key the 304 and 206 like the 200
+            self.raw_headers.append((b"vary", b"Accept-Encoding"))
+        if self.is_not_modified(scope, stat_result):
+            self.set_stat_headers(stat_result)
+            await self.not_modified(send, self.raw_headers)
+            if self.background is not None:
+                await self.background()
+            return
+
+        ranges = self.ranges(scope, stat_result)
+        if ranges is not None:
+            # ranges address the identity representation
+            await self.send_ranges(scope, send, ranges, stat_result)
+            if self.background is not None:
+                await self.background()
+            return
+
+        encoding, path, variant = None, self.path, stat_result
+        if compressible and not self.send_header_only:
+            encoding, path, variant = await run_in_threadpool(
+                compression.file_variant, self.path, stat_result, accept_encoding(scope)
+            )
+        if encoding is not None:
+            self.raw_headers.append((b"content-encoding", encoding.encode("utf-8")))
+        self.set_stat_headers(stat_result, encoding, variant.st_size)
+
         await send(
             {
                 "type": "http.response.start",
@@ -345,26 +880,9 @@ class FileResponse(Response):
         )
         if self.send_header_only:
             await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.pathsend" in (scope.get("extensions") or {}):
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(path)})
         else:
-            async with aiofiles.open(self.path, mode="rb") as file:
-                more_body = True
-                while more_body:
-                    chunk = await file.read(self.chunk_size)
-                    more_body = len(chunk) == self.chunk_size
-                    if is_zip:
-                        self.gzip_file.write(chunk)
-                        if not more_body:
-                            self.gzip_file.close()
-                        chunk = self.gzip_buffer.getvalue()
-                        self.gzip_buffer.seek(0)
-                        self.gzip_buffer.truncate()
-
-                    await send(
-                        {
-                            "type": "http.response.body",
-                            "body": chunk,
-                            "more_body": more_body,
-                        }
-                    )
+            await self.send_file(scope, send, path, [(b"", 0, variant.st_size)])
         if self.background is not None:
-            await self.background()
\ No newline at end of file
+            await self.background()
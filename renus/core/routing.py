@@ -1,6 +1,9 @@
+import functools
 import typing
 import re
 
+from renus.core.staticfiles import StaticFiles
+
 def full_path_builder(app_prefix: str, path: str):
     app_prefix = app_prefix.strip(' /')
     path = path.strip(' /')
@@ -27,12 +30,12 @@ class BaseRoute:
             if m not in self._routes:
                 self._routes[m] = []
 
-    def _add(self, path: str, controller: typing.Union[str, typing.Callable], method: str, middlewares=None, cache=None):
+    def _add(self, path: str, controller: typing.Union[str, typing.Callable], method: str, middlewares=None, cache=None, stream=False, upload=None, spool=None, max_body=None, max_parts=None):
         if middlewares is None:
             middlewares = []
         full_path = full_path_builder(self._app_prefix, path)
         middlwrs = self._middlewares.copy()
-        if self._package != '':
+        if self._package != '' and type(controller) is str:
             controller = self._package + '.' + controller
         r={
             'path': full_path,
@@ -41,32 +44,39 @@ class BaseRoute:
         }
         if cache:
             r['cache']=cache
+        if stream:
+            r['stream']=stream
+        if upload is not None:
+            r['upload']=upload
+        if spool is not None:
+            r['spool']=spool
+        if max_body is not None:
+            r['max_body']=max_body
+        if max_parts is not None:
+            r['max_parts']=max_parts
         self._routes[method].append(r)
 
     def all(self):
         return self._routes
 
-    def response(self):
-        method = self._scope['method']
-        if method not in ['POST', 'GET', 'PUT', 'OPTIONS', 'DELETE', 'WS']:
-            return False
-
-        if self._scope['path'] != '/':
-            self._scope['path'] = self._scope['path'].rstrip(' /')
-
-        path = self._scope['path']
+    def compile(self, cache_size: int = 1024):
+        return RouteTable(self._routes, cache_size)
 
-        for route in self._routes[method]:
-            regex, params = build_path(route['path'])
-            find = regex.search(path)
-            args = {}
-            if find:
-                for param in params:
-                    args[param] = find.group(param)
+    def response(self):
+        """
+        Match the scope against the routes, compiling them once per route
+        set; adding a route compiles them again on the next call.
+        """
+        key = id(self._routes)
+        version = tuple((method, len(routes)) for method, routes in self._routes.items())
+        cached = compiled_tables.get(key)
+        if cached is None or cached[0] is not self._routes or cached[1] != version:
+            cached = compiled_tables[key] = (self._routes, version, self.compile())
+        return cached[2].response(self._scope)
 
-                return build(route, args)
 
-        return False
+# route dict id -> (routes, route counts, RouteTable) for BaseRoute.response
+compiled_tables = {}
 
 
 class Router(BaseRoute):
@@ -79,20 +89,33 @@ class Router(BaseRoute):
         self._add(path, controller, 'GET', middlewares,cache)
         return self
 
-    def post(self, path, controller, middlewares=None):
-        self._add(path, controller, 'POST', middlewares)
+    def post(self, path, controller, middlewares=None, stream=False, upload=None, spool=None,
+             max_body=None, max_parts=None):
+        self._add(path, controller, 'POST', middlewares, stream=stream, upload=upload, spool=spool,
+                  max_body=max_body, max_parts=max_parts)
+        return self
+
+    def put(self, path, controller, middlewares=None, stream=False, upload=None, spool=None,
+            max_body=None, max_parts=None):
+        self._add(path, controller, 'PUT', middlewares, stream=stream, upload=upload, spool=spool,
+                  max_body=max_body, max_parts=max_parts)
         return self
 
-    def put(self, path, controller, middlewares=None):
-        self._add(path, controller, 'PUT', middlewares)
+    def static(self, prefix, directory, middlewares=None, **options):
+        """
+        Serve the files under `directory` at `prefix/<path>`; `options` go
+        to `StaticFiles`.
+        """
+        files = StaticFiles(directory, **options)
+        self._add(prefix.rstrip('/') + '/{path:.+}', files.serve, 'GET', middlewares)
         return self
 
     def option(self, path, controller, middlewares=None):
         self._add(path, controller, 'OPTIONS', middlewares)
         return self
 
-    def delete(self, path, controller, middlewares=None):
-        self._add(path, controller, 'DELETE', middlewares)
+    def delete(self, path, controller, middlewares=None, stream=False, max_body=None):
+        self._add(path, controller, 'DELETE', middlewares, stream=stream, max_body=max_body)
         return self
 
     def ws(self, path, controller, middlewares=None):
@@ -107,6 +130,153 @@ class Router(BaseRoute):
         return self
 
 
+class RouteNode:
+    __slots__ = ('static', 'dynamic', 'tails', 'index')
+
+    def __init__(self) -> None:
+        self.static = {}
+        self.dynamic = {}
+        self.tails = []
+        self.index = None
+
+
+class RouteTable:
+    """
+    Route table compiled once into a per-method segment tree.
+
+    Static segments are dict lookups, `{name}` segments are matched by a
+    precompiled per-segment regex and a `{name:regex}` param (which may span
+    several segments) matches the rest of the path with its own compiled
+    regex. When several routes match, the first registered one wins, like
+    the old linear scan.
+
+    Parameterless paths are answered from a per-method dict before the tree
+    is walked, and dynamic matches are kept in an LRU cache of `cache_size`
+    entries (0 disables it).
+    """
+
+    def __init__(self, routes: typing.Dict, cache_size: int = 1024) -> None:
+        self._routes = {}
+        self._trees = {}
+        self._static = {}
+        for method, method_routes in routes.items():
+            self._routes[method] = list(method_routes)
+            root = RouteNode()
+            for index, route in enumerate(method_routes):
+                self._insert(root, route['path'], index)
+            self._trees[method] = root
+
+            static = {}
+            for index, route in enumerate(method_routes):
+                path = route['path']
+                if param_regex.search(path) is None and path not in static:
+                    # an earlier dynamic route may shadow this path
+                    found = self._search(root, path, split_path(path), 0, {}, None)
+                    if found is not None and found[0] == index:
+                        static[path] = route
+            self._static[method] = static
+
+        self._lookup = functools.lru_cache(maxsize=cache_size)(self._resolve) if cache_size else self._resolve
+
+    def _insert(self, node: RouteNode, path: str, index: int):
+        spans = [match.span() for match in param_regex.finditer(path)]
+        start = 1
+        for segment in split_path(path):
+            end = start + len(segment)
+            inside = [span for span in spans if span[0] < end and span[1] > start]
+            if not inside:
+                node = node.static.setdefault(segment, RouteNode())
+            elif all(':' not in path[s:e] and s >= start and e <= end for s, e in inside):
+                if segment not in node.dynamic:
+                    node.dynamic[segment] = (build_path(segment), RouteNode())
+                node = node.dynamic[segment][1]
+            else:
+                regex, params = build_path(path[start:])
+                node.tails.append((regex, params, index))
+                return
+            start = end + 1
+
+        if node.index is None:
+            node.index = index
+
+    def _search(self, node: RouteNode, path: str, segments: typing.List[str], i: int, args: dict, best):
+        if i == len(segments):
+            if node.index is not None and (best is None or node.index < best[0]):
+                best = (node.index, args)
+        else:
+            child = node.static.get(segments[i])
+            if child is not None:
+                best = self._search(child, path, segments, i + 1, args, best)
+            for (regex, params), child in node.dynamic.values():
+                find = regex.search(segments[i])
+                if find:
+                    found = dict(args)
+                    for param in params:
+                        found[param] = find.group(param)
+                    best = self._search(child, path, segments, i + 1, found, best)
+
+        # a tail needs something after its prefix; `/files/{p:.*}` is not `/files`
+        if node.tails and (i < len(segments) or path == '/'):
+            rest = '/'.join(segments[i:])
+            for regex, params, index in node.tails:
+                if best is not None and index > best[0]:
+                    continue
+                find = regex.search(rest)
+                if find:
+                    found = dict(args)
+                    for param in params:
+                        found[param] = find.group(param)
+                    best = (index, found)
+        return best
+
+    def _resolve(self, method: str, path: str):
+        found = self._search(self._trees[method], path, split_path(path), 0, {}, None)
+        if found is None:
+            return None
+        index, args = found
+        return index, tuple(args.items())
+
+    def match(self, method: str, path: str):
+        static = self._static.get(method)
+        if static is None:
+            return False
+
+        route = static.get(path)
+        if route is not None:
+            return build(route, {})
+
+        found = self._lookup(method, path)
+        if found is None:
+            return False
+        index, args = found
+        return build(self._routes[method][index], dict(args))
+
+    def cache_info(self):
+        if hasattr(self._lookup, 'cache_info'):
+            return self._lookup.cache_info()
+        return None
+
+    def cache_clear(self):
+        if hasattr(self._lookup, 'cache_clear'):
+            self._lookup.cache_clear()
+
+    def response(self, scope):
+        method = scope['method']
+        if method not in ['POST', 'GET', 'PUT', 'OPTIONS', 'DELETE', 'WS']:
+            return False
+
+        if scope['path'] != '/':
+            scope['path'] = scope['path'].rstrip(' /')
+
+        return self.match(method, scope['path'])
+
+
+def split_path(path: str) -> typing.List[str]:
+    if path in ('', '/'):
+        return []
+    return path.split('/')[1:]
+
+
 def build(route, args):
     controller = route['controller']
     res = {}
@@ -114,6 +284,11 @@ def build(route, args):
     res['args'] = args
     res['middlewares'] = route['middlewares']
     res['cache'] = route.get('cache',None)
+    res['stream'] = route.get('stream',False)
+    res['upload'] = route.get('upload',None)
+    res['spool'] = route.get('spool',None)
+    res['max_body'] = route.get('max_body',None)
+    res['max_parts'] = route.get('max_parts',None)
     if type(controller) is str:
         res['controller'], res['func'] = controller.split('@')
     else:
@@ -122,9 +297,12 @@ def build(route, args):
     return res
 
 
+param_regex = re.compile("{([a-zA-Z_][a-zA-Z0-9_]*)(:[\s\S]*)?}")
+
+
 def build_path(
         path: str,
-        param_regex=re.compile("{([a-zA-Z_][a-zA-Z0-9_]*)(:[\s\S]*)?}")
+        param_regex=param_regex
 ) -> typing.Tuple[typing.Pattern, typing.List[str]]:
     path_regex = "^"
     idx = 0
@@ -0,0 +1,142 @@
+import os
+import stat
+import time
+import typing
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+
+from renus.core.compression import compressor, content_type
+from renus.core.concurrency import run_in_threadpool
+from renus.core.response import CachedResponse, FileResponse, TextResponse, scope_header
+from renus.core.status import Status
+
+
+class StaticResponse(CachedResponse):
+    """
+    A small file served from memory. Headers are built once per file
+    version and each compressed variant is computed once.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if_modified_since = scope_header(scope, b"if-modified-since")
+        if if_modified_since and not scope_header(scope, b"if-none-match"):
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError, IndexError):
+                since = None
+            if since is not None and int(self.entry["mtime"]) <= since:
+                raw_headers = self.raw_headers + [(b"etag", f'"{self.entry["etag"]}"'.encode())]
+                if compressor().eligible(content_type(self.raw_headers), len(self.body)):
+                    raw_headers.append((b"vary", b"Accept-Encoding"))
+                await self.not_modified(send, raw_headers)
+                return
+        await super().__call__(scope, receive, send)
+
+
+class StaticFiles:
+    """
+    Serves the files under `directory`, mounted with `Router.static`.
+
+    Request paths are resolved with `realpath`, and anything that lands
+    outside `directory` (`..`, symlinks) is a 404. Lookups (resolved path,
+    stat and MIME type) are kept in an LRU of `cache_size` entries and
+    checked again after `ttl` seconds. Files up to `memory_size` bytes are
+    kept in memory, `memory_entries` at most, and dropped when their mtime
+    or size changes.
+    """
+
+    def __init__(self, directory: str, memory_size: int = 64 * 1024, memory_entries: int = 256,
+                 cache_size: int = 1024, ttl: float = 1.0) -> None:
+        self.directory = os.path.realpath(directory)
+        self.memory_size = memory_size
+        self.memory_entries = memory_entries
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._lookups = OrderedDict()
+        self._memory = OrderedDict()
+
+    def resolve(self, path: str) -> typing.Optional[str]:
+        if "\x00" in path:
+            return None
+        full = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if full != self.directory and not full.startswith(self.directory + os.sep):
+            return None
+        return full
+
+    def lookup_disk(self, path: str) -> typing.Tuple[typing.Optional[str], typing.Optional[os.stat_result]]:
+        full = self.resolve(path)
+        if full is None:
+            return None, None
+        try:
+            stat_result = os.stat(full)
+        except OSError:
+            return full, None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return full, None
+        return full, stat_result
+
+    async def lookup(self, path: str) -> typing.Tuple[typing.Optional[str], typing.Optional[os.stat_result], str]:
+        now = time.monotonic()
+        cached = self._lookups.get(path)
+        if cached is not None and cached[3] > now:
+            self._lookups.move_to_end(path)
+            return cached[:3]
+
+        full, stat_result = await run_in_threadpool(self.lookup_disk, path)
+        media_type = None
+        if full is not None:
+            if cached is not None and cached[0] == full:
+                media_type = cached[2]
+            else:
+                media_type = guess_type(full)[0] or "text/plain"
+        self._lookups[path] = (full, stat_result, media_type, now + self.ttl)
+        self._lookups.move_to_end(path)
+        while len(self._lookups) > self.cache_size:
+            self._lookups.popitem(last=False)
+        return full, stat_result, media_type
+
+    def read_entry(self, full: str, stat_result: os.stat_result, media_type: str) -> dict:
+        with open(full, "rb") as file:
+            body = file.read()
+        content_type = media_type
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        return {
+            "version": (stat_result.st_mtime_ns, stat_result.st_size),
+            "mtime": stat_result.st_mtime,
+            "status_code": Status.HTTP_200_OK,
+            "raw_headers": [
+                (b"content-type", content_type.encode("utf-8")),
+                (b"last-modified", formatdate(stat_result.st_mtime, usegmt=True).encode("utf-8")),
+            ],
+            "body": body,
+            "encoded": {},
+            "strong_etag": True,
+            "etag": FileResponse.etag(stat_result),
+        }
+
+    async def memory_entry(self, full: str, stat_result: os.stat_result, media_type: str) -> dict:
+        entry = self._memory.get(full)
+        if entry is None or entry["version"] != (stat_result.st_mtime_ns, stat_result.st_size):
+            entry = await run_in_threadpool(self.read_entry, full, stat_result, media_type)
+            if len(entry["body"]) != stat_result.st_size:
+                # changed while being read; serve it but keep nothing
+                return entry
+            self._memory[full] = entry
+        self._memory.move_to_end(full)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+        return entry
+
+    async def serve(self, path: str):
+        full, stat_result, media_type = await self.lookup(path)
+        if stat_result is None:
+            return TextResponse('not_found', Status.HTTP_404_NOT_FOUND)
+        if stat_result.st_size <= self.memory_size:
+            return StaticResponse(await self.memory_entry(full, stat_result, media_type))
+        return FileResponse(full, stat_result=stat_result, media_type=media_type)
+
+    def clear(self) -> None:
+        self._lookups.clear()
+        self._memory.clear()
@@ -1,5 +1,8 @@
 import re
 
+url_regex = re.compile(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))")
+ip_regex = re.compile(r"^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$")
+
 def valid_required(data:dict)->any:
     if data['input'] is not None:
         return True
@@ -259,9 +262,7 @@ def valid_url(data):
     string = valid_string(data)
     if string is not True:
         return string
-    pattern = r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
-
-    if re.compile(pattern).fullmatch(data['input']) is not None:
+    if url_regex.fullmatch(data['input']) is not None:
         return True
     return ['url_error', [data['input']]]
 
@@ -272,7 +273,7 @@ def valid_ip(data):
     string = valid_string(data)
     if string is not True:
         return string
-    ipv = re.match(r"^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$", data['input'])
+    ipv = ip_regex.match(data['input'])
     if bool(ipv) and all(map(lambda n: 0 <= int(n) <= 255, ipv.groups())):
         return True
 
@@ -1,10 +1,14 @@
+import functools
+from collections.abc import Mapping
+
 from renus.core.exception import abort_if
+from renus.core.validation import rules as validators
 
 def keys_exists(element, keys):
     '''
-    Check if *keys (nested) exists in `element` (dict).
+    Check if *keys (nested) exists in `element` (dict or other mapping).
     '''
-    if not isinstance(element, dict):
+    if not isinstance(element, Mapping):
         raise AttributeError('keys_exists() expects dict as first argument.')
     if len(keys) == 0:
         raise AttributeError('keys_exists() expects at least two arguments, one given.')
@@ -58,8 +62,8 @@ class Validate:
         msg=[]
         for rule in rules:
             if rule not in ['default']:
-                name, args = type_rule(rule)
-                test = getattr(__import__('renus.core.validation.rules', fromlist=['']), 'valid_' + name)({'input': input, 'args': args})
+                func, args = compile_rule(rule)
+                test = func({'input': input, 'args': list(args)})
                 if test != True:
                     error=True
                     msg.append(test)
@@ -73,3 +77,9 @@ def type_rule(rule: str):
     arr.pop(0)
     args = arr
     return [name, args]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_rule(rule: str):
+    name, args = type_rule(rule)
+    return getattr(validators, 'valid_' + name), tuple(args)
@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+from renus.core.config import registry
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """
+    An empty application folder with a `config/app.json`, as the working
+    directory.
+    """
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'app.json').write_text(json.dumps({'env': 'test', 'debug': False}))
+    monkeypatch.chdir(tmp_path)
+    registry.load()
+    yield tmp_path
+    registry._configs = None
+    registry._mtimes = {}
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+# renus.app needs renus.core.websockets, which this tree does not ship
+pytest.importorskip('renus.core.websockets')
+
+from renus.app import App  # noqa: E402
+from renus.core.response import JsonResponse  # noqa: E402
+from renus.core.routing import Router  # noqa: E402
+
+
+@pytest.fixture
+def app(app_dir):
+    def make(config=None, cache=30):
+        if config is not None:
+            (app_dir / 'config' / 'app.json').write_text(json.dumps(config))
+        calls = []
+
+        def show(id, request):
+            calls.append(id)
+            return JsonResponse({'id': id, 'n': len(calls),
+                                 'user': request.headers.get('authorization')})
+
+        application = App()
+        routes = {}
+        Router(routes=routes).get('/items/{id}', show, cache=cache).get('/live/{id}', show)
+        application.routes = routes
+        application.route_table = Router(routes=routes).compile()
+        return application, calls
+    return make
+
+
+def get(app, path, query_string=b'', headers=()):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string,
+             'headers': list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status'], json.loads(b''.join(m.get('body', b'') for m in sent[1:]))
+
+
+def test_cached_by_path_and_query(app):
+    application, calls = app()
+    assert get(application, '/items/1')[1]['n'] == 1
+    assert get(application, '/items/1')[1]['n'] == 1
+    assert get(application, '/items/1', b'page=2')[1]['n'] == 2
+    assert get(application, '/items/2')[1]['n'] == 3
+    assert get(application, '/live/1')[1]['n'] == 4
+    assert get(application, '/live/1')[1]['n'] == 5
+    assert calls == ['1', '1', '2', '1', '1']
+
+
+def test_credentials_are_not_shared(app):
+    application, calls = app()
+    alice = [(b'authorization', b'Bearer alice')]
+    bob = [(b'authorization', b'Bearer bob')]
+    assert get(application, '/items/1', headers=alice)[1]['user'] == 'Bearer alice'
+    assert get(application, '/items/1', headers=bob)[1]['user'] == 'Bearer bob'
+    assert get(application, '/items/1', headers=alice)[1] == {'id': '1', 'n': 1, 'user': 'Bearer alice'}
+    assert get(application, '/items/1')[1]['n'] == 3
+
+    get(application, '/items/1', headers=[(b'cookie', b'session=a')])
+    get(application, '/items/1', headers=[(b'cookie', b'session=b')])
+    assert len(calls) == 5
+
+
+def test_custom_vary_headers(app):
+    application, calls = app({'cache_vary_headers': ['accept-language']})
+    get(application, '/items/1', headers=[(b'accept-language', b'en')])
+    get(application, '/items/1', headers=[(b'accept-language', b'fa')])
+    get(application, '/items/1', headers=[(b'accept-language', b'en'), (b'authorization', b'x')])
+    assert len(calls) == 2
+
+
+def test_entries_expire(app, monkeypatch):
+    application, calls = app(cache=10)
+    now = [1000.0]
+    monkeypatch.setattr('renus.core.response.time.monotonic', lambda: now[0])
+    get(application, '/items/1')
+    now[0] += 9
+    get(application, '/items/1')
+    assert len(calls) == 1
+    now[0] += 2
+    get(application, '/items/1')
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entry_is_dropped(app):
+    application, calls = app({'response_cache_size': 2})
+    get(application, '/items/1')
+    get(application, '/items/2')
+    get(application, '/items/1')
+    get(application, '/items/3')
+    assert len(calls) == 3
+    get(application, '/items/1')
+    assert len(calls) == 3
+    get(application, '/items/2')
+    assert len(calls) == 4
+
+
+def test_purge(app):
+    application, calls = app()
+    for id in ('1', '2', '10'):
+        get(application, f'/items/{id}')
+    cache = application.response_cache
+    assert cache.purge('/items/1/') == 1
+    get(application, '/items/2')
+    assert len(calls) == 3
+    get(application, '/items/1')
+    assert len(calls) == 4
+    assert cache.purge('/items/1', prefix=True) == 2
+    assert cache.purge() == 1
+    get(application, '/items/2')
+    assert len(calls) == 5
@@ -0,0 +1,27 @@
+import json
+import os
+
+from renus.core.config import registry
+from renus.core.formparsers import upload_path
+
+
+def test_upload_path_keeps_allowed_extensions(app_dir):
+    path = upload_path('media', 'photo.JPG')
+    folder, name = os.path.split(path)
+    assert folder == os.path.join('storage', 'public', 'media')
+    assert os.path.isdir(folder)
+    assert name.endswith('.jpg') and len(name) == 32 + 4
+
+
+def test_upload_path_drops_unsafe_extensions(app_dir):
+    for filename in ('../../evil.PHP', 'page.html', 'image.svg', 'run.cgi', 'x.phtml', 'noext', '.htaccess', 'a.jpg/'):
+        path = upload_path('media', filename)
+        assert os.path.dirname(path) == os.path.join('storage', 'public', 'media'), filename
+        assert '.' not in os.path.basename(path), filename
+
+
+def test_upload_extensions_config(app_dir):
+    (app_dir / 'config' / 'app.json').write_text(json.dumps({'upload_extensions': ['.svg']}))
+    registry.load()
+    assert upload_path('media', 'logo.svg').endswith('.svg')
+    assert '.' not in os.path.basename(upload_path('media', 'photo.jpg'))
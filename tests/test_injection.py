@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from renus.core.injection import Injection
+
+# the differential corpus: the compiled engine has to give the Xss output
+corpus = [
+    '', 'plain text', '  padded  ', 'a & b', 'x &amp;lt; y', "it's \"quoted\"",
+    '<p>Hello <b>world</b></p>', '<P CLASS="Lead">Upper</P>', '<b>unclosed', 'closed</b>',
+    '<a href="https://example.com" target="_blank" onclick="x()">link</a>',
+    '<a href="javascript:alert(1)">x</a>', '<a href=//evil.com>x</a>', '<img src="x.png" alt=\'a "b"\'/>',
+    '<img src=x.png>', '<br/><hr /><br>', '<div class=box data-x="1">d</div>', '<i title="a>b">t</i>',
+    '<a href="x" href="y">dup</a>', '<a href="&quot;&lt;">ent</a>', '&#x3C;script&#x3E;', '1 < 2 > 0',
+    '<script>alert(1)</script>', '<style>p{}</style>', '<!-- comment -->', '<!doctype html>', '<?xml ?>',
+    '<a b>', '<a b="1">', '<a x=y/>', '<p>tail &am', '<ul><li>one<li>two</ul>', '</>', '<>', '<',
+]
+
+words = ['lorem', 'ipsum', '&amp;', 'dolor', "it's", '"q"', 'sit', 'amet']
+tags = ['<p>', '</p>', '<b>', '</b>', '<a href="https://example.com/x?a=1&amp;b=2" target="_blank">', '</a>',
+        '<img src="/img/a.png" alt="pic">', '<br>', '<span class="note">', '</span>', '<em>', '</em>']
+
+
+def document(size: int, seed: int = 0) -> str:
+    """
+    Rich text of about `size` characters, the same for the same seed.
+    """
+    rand = random.Random(seed)
+    parts = []
+    while sum(map(len, parts)) < size:
+        parts.append(rand.choice(tags) if rand.random() < 0.3 else ' '.join(rand.choices(words, k=rand.randint(1, 8))))
+    return ''.join(parts)
+
+
+def outcome(injection, value):
+    try:
+        return injection.escape(value)
+    except Exception as exc:
+        return type(exc)
+
+
+@pytest.mark.parametrize('value', corpus + [document(2000, seed) for seed in range(50)])
+def test_compiled_matches_parser(value):
+    assert outcome(Injection('compiled'), value) == outcome(Injection(), value)
+
+
+def test_compiled_matches_parser_fuzz():
+    rand = random.Random(1)
+    alphabet = ['<', '>', '/', '=', '"', "'", '&', ';', '#', ' ', '\n', 'a', 'b', 'p', 'img', 'href', 'src',
+                'script', 'class', 'javascript:', 'http:', '//', 'amp', 'lt', 'x3C', '!--', '-->']
+    parser, compiled = Injection(), Injection('compiled')
+    for i in range(3000):
+        value = ''.join(rand.choices(alphabet, k=rand.randint(1, 24)))
+        assert outcome(compiled, value) == outcome(parser, value), value
@@ -0,0 +1,135 @@
+import asyncio
+import os
+
+import pytest
+
+from renus.core.config import registry
+from renus.core.datastructures import FormData
+from renus.core.formparsers import MultiPartParser
+from renus.core.injection import injection
+from renus.core.request import Request
+from renus.core.validation.validate import Validate
+
+
+def request(body, content_type: bytes, method: str = 'POST', headers=()) -> Request:
+    """
+    `body` is the whole body, or a list of the chunks it arrives in.
+    """
+    chunks = list(body) if isinstance(body, list) else [body]
+
+    async def receive():
+        return {'type': 'http.request', 'body': chunks.pop(0) if chunks else b'', 'more_body': bool(chunks)}
+
+    scope = {'type': 'http', 'method': method, 'path': '/', 'query_string': b'',
+             'headers': [(b'content-type', content_type)] + list(headers)}
+    return Request(scope, receive)
+
+
+def too_large(req: Request) -> bool:
+    with pytest.raises(RuntimeError) as info:
+        asyncio.run(req.load())
+    return info.value.args == ('request_entity_too_large', 413)
+
+
+def test_urlencoded_fields_are_sanitized(app_dir):
+    req = request(b'name=%3Cscript%3Ealert(1)%3C/script%3E&%3Cb%3E=x&tag=a&tag=b',
+                  b'application/x-www-form-urlencoded')
+    asyncio.run(req.load())
+    form = req.inputs
+    assert isinstance(form, FormData)
+    assert form['name'] == '&lt;scrlpt&gt;alert(1)&lt;/scrlpt&gt;'
+    assert '&lt;b&gt;' in form
+    assert [v for k, v in form.multi_items() if k == 'tag'] == ['a', 'b']
+    assert Validate(form).rules({'name': ['required', 'string'], 'tag': ['in:a:b']}) == {
+        'name': '&lt;scrlpt&gt;alert(1)&lt;/scrlpt&gt;', 'tag': 'b'}
+
+
+def test_json_body_is_sanitized(app_dir):
+    req = request(b'{"name": "<script>alert(1)</script>"}', b'application/json')
+    asyncio.run(req.load())
+    assert req.inputs == {'name': '&lt;scrlpt&gt;alert(1)&lt;/scrlpt&gt;'}
+
+
+def test_get_inputs_loads_the_body(app_dir):
+    req = request(b'{"token": "abc"}', b'application/json')
+    with pytest.raises(RuntimeError):
+        req.inputs
+    assert asyncio.run(req.get_inputs()) == {'token': 'abc'}
+    asyncio.run(req.load())
+    assert req.inputs == {'token': 'abc'}
+
+
+def test_sanitizer_config_selects_the_engine(app_dir):
+    (app_dir / 'config' / 'app.json').write_text('{"sanitizer": "compiled"}')
+    registry.load()
+    assert injection()._compiled is not None
+
+    req = request(b'{"body": "<p class=\\"x\\" onclick=\\"y\\">hi</p>"}', b'application/json')
+    assert asyncio.run(req.get_inputs()) == {'body': '&lt;p class=&quot;x&quot;&gt;hi&lt;/p&gt;'}
+
+
+def test_ad_hoc_attributes(app_dir):
+    req = request(b'', b'application/json', 'GET')
+    req.user = {'id': 1}
+    assert req.user == {'id': 1}
+
+
+def test_content_length_over_the_limit(app_dir):
+    (app_dir / 'config' / 'app.json').write_text('{"max_body_size": 10}')
+    registry.load()
+    read = []
+    req = request(b'{"a": "0123456789"}', b'application/json', headers=[(b'content-length', b'19')])
+    req._receive = lambda: read.append(1)
+    assert too_large(req)
+    assert read == []
+
+    req = request(b'{}', b'application/json', headers=[(b'content-length', b'x')])
+    with pytest.raises(RuntimeError) as info:
+        asyncio.run(req.load())
+    assert info.value.args == ('invalid_content_length', 400)
+
+
+def test_streamed_body_over_the_limit(app_dir):
+    (app_dir / 'config' / 'app.json').write_text('{"max_body_size": 10}')
+    registry.load()
+    assert too_large(request([b'{"a": ', b'"0123', b'456789"}'], b'application/json'))
+    req = request([b'{"a":', b'"01"}'], b'application/json')
+    assert asyncio.run(req.get_inputs()) == {'a': '01'}
+
+
+def test_route_max_body_overrides_the_config(app_dir):
+    (app_dir / 'config' / 'app.json').write_text('{"max_body_size": 10}')
+    registry.load()
+    req = request([b'{"a": ', b'"0123456789"}'], b'application/json')
+    req.route = {'max_body': 100}
+    assert asyncio.run(req.get_inputs()) == {'a': '0123456789'}
+
+    req = request([b'{"a": ', b'"01"}'], b'application/json')
+    req.route = {'max_body': 5}
+    assert too_large(req)
+
+
+def test_max_parts_removes_written_uploads(app_dir, monkeypatch):
+    def part(name, filename=None):
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        return f'--b\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + b'x' * 1000 + b'\r\n'
+
+    chunks = [part('a', 'a.txt'), part('b', 'b.txt')[:500], part('b', 'b.txt')[500:] + part('c'), b'--b--\r\n']
+    req = request(chunks, b'multipart/form-data; boundary=b')
+    req.route = {'upload': 'media', 'max_parts': 2}
+    folder = app_dir / 'storage' / 'public' / 'media'
+    written = []
+    flush = MultiPartParser.flush
+
+    async def spy(parser):
+        await flush(parser)
+        written.append(len(os.listdir(folder)))
+
+    monkeypatch.setattr(MultiPartParser, 'flush', spy)
+    with pytest.raises(RuntimeError) as info:
+        asyncio.run(req.load())
+    assert info.value.args == ('too_many_parts', 413)
+    assert written == [1, 2]
+    assert os.listdir(folder) == []
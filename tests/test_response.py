@@ -0,0 +1,175 @@
+import asyncio
+import os
+from email.utils import formatdate
+
+import pytest
+
+from renus.core.response import EventSourceResponse, FileResponse, parse_range
+
+
+@pytest.fixture
+def file(app_dir):
+    path = app_dir / 'data.bin'
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+def fetch(response, headers=()):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'GET', 'headers': [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(response(scope, None, send))
+    start = sent[0]
+    return start['status'], dict((k.decode(), v.decode()) for k, v in start['headers']), \
+        b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_file_etag_is_quoted(file):
+    status, headers, body = fetch(FileResponse(file))
+    etag = FileResponse.etag(os.stat(file))
+    assert status == 200
+    assert headers['etag'] == f'"{etag}"'
+
+    for validator in (f'"{etag}"', etag, f'W/"{etag}"', f'"other", "{etag}"'):
+        status, headers, body = fetch(FileResponse(file), [('if-none-match', validator)])
+        assert status == 304 and body == b''
+        assert headers['etag'] == f'"{etag}"'
+    assert fetch(FileResponse(file), [('if-none-match', '"other"')])[0] == 200
+
+
+@pytest.mark.parametrize('header, ranges', [
+    ('bytes=0-99', [(0, 100)]),
+    ('bytes=100-', [(100, 1024)]),
+    ('bytes=-100', [(924, 1024)]),
+    ('bytes=-5000', [(0, 1024)]),
+    ('bytes=1000-5000', [(1000, 1024)]),
+    ('bytes=0-0, 10-19,', [(0, 1), (10, 20)]),
+    ('bytes=2000-', []),
+    ('bytes=2000-3000, 5000-', []),
+    ('bytes=-0', []),
+    ('bytes=20-10', None),
+    ('bytes=-', None),
+    ('bytes=a-b', None),
+    ('items=0-9', None),
+    ('bytes=', None),
+    (','.join(['bytes=0-0'] + ['%d-%d' % (i, i) for i in range(1, 17)]), None),
+])
+def test_parse_range(header, ranges):
+    assert parse_range(header, 1024) == ranges
+
+
+def test_max_ranges(file):
+    header = 'bytes=' + ','.join('%d-%d' % (i, i) for i in range(5))
+    assert parse_range(header, 1024, max_ranges=5) == [(i, i + 1) for i in range(5)]
+    assert parse_range(header, 1024, max_ranges=4) is None
+
+    response = FileResponse(file)
+    response.max_ranges = 4
+    status, headers, body = fetch(response, [('range', header)])
+    assert status == 200 and len(body) == 1024
+
+
+def test_single_range(file):
+    status, headers, body = fetch(FileResponse(file), [('range', 'bytes=-10')])
+    assert status == 206
+    assert headers['content-range'] == 'bytes 1014-1023/1024'
+    assert body == (bytes(range(256)) * 4)[-10:]
+    assert headers['content-length'] == '10'
+
+
+def test_unsatisfiable_range(file):
+    status, headers, body = fetch(FileResponse(file), [('range', 'bytes=1024-')])
+    assert status == 416
+    assert headers['content-range'] == 'bytes */1024'
+    assert body == b''
+
+
+def test_multipart_ranges(file):
+    data = bytes(range(256)) * 4
+    status, headers, body = fetch(FileResponse(file, media_type='application/octet-stream'),
+                                  [('range', 'bytes=0-9,100-199,-24')])
+    assert status == 206
+    assert int(headers['content-length']) == len(body)
+    media_type, boundary = headers['content-type'].split('; boundary=')
+    assert media_type == 'multipart/byteranges'
+    parts = body.split(f'--{boundary}'.encode())
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    for part, (start, end) in zip(parts[1:-1], [(0, 10), (100, 200), (1000, 1024)]):
+        head, payload = part.split(b'\r\n\r\n', 1)
+        assert head == (f'\r\nContent-Type: application/octet-stream\r\n'
+                        f'Content-Range: bytes {start}-{end - 1}/1024').encode()
+        assert payload == data[start:end] + b'\r\n'
+
+
+def test_if_range(file):
+    stat_result = os.stat(file)
+    etag = FileResponse.etag(stat_result)
+    date = formatdate(stat_result.st_mtime, usegmt=True)
+    for validator in (f'"{etag}"', etag, date):
+        assert fetch(FileResponse(file), [('range', 'bytes=0-9'), ('if-range', validator)])[0] == 206
+    for validator in ('"other"', f'W/"{etag}"', formatdate(stat_result.st_mtime - 60, usegmt=True)):
+        status, headers, body = fetch(FileResponse(file), [('range', 'bytes=0-9'), ('if-range', validator)])
+        assert status == 200 and len(body) == 1024
+
+
+def test_mapped_file(file):
+    class MappedFileResponse(FileResponse):
+        mmap_min_size = 1
+        chunk_size = 100
+
+    data = bytes(range(256)) * 4
+    assert FileResponse.mmap_min_size is None
+    assert fetch(MappedFileResponse(file))[2] == data
+    status, headers, body = fetch(MappedFileResponse(file), [('range', 'bytes=10-209,-24')])
+    assert int(headers['content-length']) == len(body)
+    assert data[10:210] in body and data[-24:] in body
+
+
+def events(overflow, delay=0.0, count=20):
+    """
+    The ids a client gets from a producer that never awaits, like a backlog
+    replayed after `Last-Event-ID`; `delay` makes the client slow.
+    """
+    async def content():
+        for i in range(count):
+            yield {'id': i, 'data': 'x'}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    response = EventSourceResponse(content(), queue_size=3, overflow=overflow)
+    asyncio.run(response({'type': 'http', 'headers': []}, receive, send))
+    body = b''.join(m.get('body', b'') for m in sent[1:]).decode()
+    return [int(line[4:]) for line in body.split('\n') if line.startswith('id: ')]
+
+
+@pytest.mark.parametrize('overflow', ['wait', 'drop', 'close'])
+def test_event_burst_reaches_a_fast_client(app_dir, overflow):
+    assert events(overflow) == list(range(20))
+
+
+def test_event_overflow_wait(app_dir):
+    assert events('wait', 0.001) == list(range(20))
+
+
+def test_event_overflow_drop(app_dir):
+    ids = events('drop', 0.001)
+    assert len(ids) < 20
+    assert ids == sorted(ids) and ids[-3:] == [17, 18, 19]
+
+
+def test_event_overflow_close(app_dir):
+    # the queued events still reach the client before the stream ends
+    ids = events('close', 0.001)
+    assert ids == list(range(len(ids)))
+    assert 3 < len(ids) < 20
@@ -0,0 +1,94 @@
+import itertools
+
+import pytest
+
+from renus.core.routing import Router, build, build_path, compiled_tables
+
+ROUTES = [
+    '/',
+    '/health',
+    '/items',
+    '/items/{id}',
+    '/items/{id}/edit',
+    '/items/new',
+    '/items/{id:[0-9]+}/raw',
+    '/files/{path:.*}',
+    '/files/{path:.+}',
+    '/assets/{path:.+}',
+    '/docs/v{version}/{page}',
+    '/docs/{rest:.*}',
+    '/user/{name}.{ext}',
+    '/user/{name}',
+    '/a/{b}/c/{d}',
+    '/a/b/{c:[a-z]+/[a-z]+}',
+    '/prefix{tail:.*}',
+    '/{catch:.*}',
+]
+
+PATHS = [
+    '/', '/health', '/items', '/items/', '/items/5', '/items/new', '/items/5/edit', '/items/5/raw',
+    '/items/x/raw', '/files', '/files/', '/files/a', '/files/a/b/c', '/files//x', '/assets',
+    '/assets/css/a.css', '/docs', '/docs/v1/intro', '/docs/vx', '/docs/a/b', '/user/bob',
+    '/user/bob.json', '/user/', '/a/1/c/2', '/a/b/x/y', '/a/b/c/d', '/prefix', '/prefixed/more',
+    '/nothing/here', '/health/x',
+]
+
+
+def linear(routes, path):
+    """
+    The match the old per-request linear scan returned.
+    """
+    if path != '/':
+        path = path.rstrip(' /')
+    for route in routes:
+        regex, params = build_path(route['path'])
+        find = regex.search(path)
+        if find:
+            return build(route, {param: find.group(param) for param in params})
+    return False
+
+
+def table(paths):
+    router = Router(routes={})
+    for path in paths:
+        router.get(path, 'items@show')
+    return router.all()['GET'], router.compile()
+
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_tree_matches_linear_scan(size):
+    for paths in itertools.combinations(ROUTES, size):
+        routes, compiled = table(paths)
+        for path in PATHS:
+            found = compiled.response({'method': 'GET', 'path': path})
+            assert found == linear(routes, path), (paths, path)
+
+
+def test_tree_matches_linear_scan_all_routes():
+    for paths in (ROUTES, ROUTES[::-1]):
+        routes, compiled = table(paths)
+        for path in PATHS:
+            assert compiled.response({'method': 'GET', 'path': path}) == linear(routes, path), path
+
+
+def test_empty_tail_needs_a_segment():
+    routes, compiled = table(['/files/{path:.*}'])
+    assert compiled.response({'method': 'GET', 'path': '/files'}) is False
+    assert compiled.response({'method': 'GET', 'path': '/files/a/b'})['args'] == {'path': 'a/b'}
+
+    routes, compiled = table(['/{path:.*}'])
+    assert compiled.response({'method': 'GET', 'path': '/'})['args'] == {'path': ''}
+
+
+def test_router_response_reuses_the_compiled_table():
+    routes = {}
+    router = Router(routes=routes).get('/items/{id}', 'items@show')
+    found = Router({'method': 'GET', 'path': '/items/1'}, routes).response()
+    assert found['args'] == {'id': '1'}
+    table = compiled_tables[id(routes)][2]
+    Router({'method': 'GET', 'path': '/items/2'}, routes).response()
+    assert compiled_tables[id(routes)][2] is table
+
+    router.get('/other', 'items@other')
+    assert Router({'method': 'GET', 'path': '/other'}, routes).response()['func'] == 'other'
+    assert compiled_tables[id(routes)][2] is not table
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from renus.core.codec import codec
+
+from renus.core.request import Request
+from renus.core.validation.validate import Validate
+
+
+def request(query_string: bytes) -> Request:
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': [], 'query_string': query_string}, None)
+
+
+def test_validate_query_params():
+    params = request(b'page=2&sort=name&q=%3Cb%3Ehi%3C/b%3E').query_params
+    data = Validate(params).rules({
+        'page': ['required', 'numeric'],
+        'sort': ['in:name:date'],
+        'q': ['string'],
+    })
+    assert data == {'page': '2', 'sort': 'name', 'q': '&lt;b&gt;hi&lt;/b&gt;'}
+
+
+def test_validate_query_params_errors():
+    params = request(b'sort=size').query_params
+    with pytest.raises(RuntimeError) as info:
+        Validate(params).rules({'page': ['required'], 'sort': ['in:name:date']})
+    msg, status = info.value.args
+    assert status == 422
+    assert set(msg['errors']) == {'page', 'sort'}
+
+
+def test_query_params_encode_like_a_dict():
+    params = request(b'a=1&a=%3Cscript%3E&b=').query_params
+    assert dict(params) == {'a': '&lt;scrlpt&gt;', 'b': ''}
+    assert json.loads(codec().dumps(params)) == {'a': '&lt;scrlpt&gt;', 'b': ''}
+    assert params.getlist('a') == ['1', '&lt;scrlpt&gt;']
+
+
+def test_query_params_sanitize_only_what_is_read(monkeypatch):
+    params = request(b'&'.join(b'k%d=%%3Cb%%3E%d' % (i, i) for i in range(40))).query_params
+    escaped = []
+    escape = params._injection.escape
+    monkeypatch.setattr(params._injection, 'escape', lambda value: escaped.append(value) or escape(value))
+    assert params.get('k7') == '&lt;b&gt;7'
+    assert params['k7'] == '&lt;b&gt;7'
+    assert params.get('missing', 'x') == 'x'
+    assert escaped.count('<b>7') == 1
+    assert [value for value in escaped if value.startswith('<b>')] == ['<b>7']